@@ -1,20 +1,45 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile, Bot
 from telegram.ext import ContextTypes
+import asyncio
+import io
 import logging
 
-from user_management import set_user_language, is_vip
-from utils import save_json, load_json
+from user_management import set_user_language, set_vip, reset_user_languages, get_user_profile
+import user_management
+import translation_service
 from translation_service import translate_text
-from constants import VALID_LANGUAGE_CODES, USER_SETTINGS_FILE, VIP_USERS_FILE, USER_INFO_FILE, ADMIN_USER_IDS
-# Import von usage_stats
-from usage_stats import usage_stats
+from constants import VALID_LANGUAGE_CODES, ADMIN_USER_IDS
+import state
+from state import user_settings, vip_users, usage_stats, group_settings
+from prompts import token_report
+from inline_translation import inline_report
+from jobs import submit_jobs
+from durable_queue import PRIORITY_LOW
+import inline_translation
+import speculative_translation
+from speculative_translation import speculative_report
+from profiling_tools import (
+    run_cpu_profile, stop_cpu_profile, memory_snapshot, stop_memory_tracing, memory_tracing_active, dump_tasks,
+    watch_container
+)
 
 logger = logging.getLogger(__name__)
 
-# Daten laden
-user_settings = load_json(USER_SETTINGS_FILE)
-vip_users = set(load_json(VIP_USERS_FILE, []))
-user_info = load_json(USER_INFO_FILE)
+PROFILE_DEFAULT_SECONDS = 30
+
+# Container, deren Größe in Speicher-Snapshots erscheint
+watch_container("_translation_cache", lambda: translation_service._translation_cache)
+watch_container("_prefix_index", lambda: translation_service._prefix_index)
+watch_container("user_info", lambda: state._user_info or {})  # Nicht get_user_info(): würde den kalten Speicher laden
+watch_container("user_management _index", lambda: user_management._index)
+watch_container("user_management _pending_profiles", lambda: user_management._pending_profiles)
+watch_container("user_settings", lambda: user_settings)
+watch_container("usage_stats", lambda: usage_stats)
+watch_container("vip_users", lambda: vip_users)
+watch_container("group_settings", lambda: group_settings)
+watch_container("inline _pending_requests", lambda: inline_translation._pending_requests)
+watch_container("speculative _seen_posts", lambda: speculative_translation._seen_posts)
+watch_container("speculative _unused_keys", lambda: speculative_translation._unused_keys)
 
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
@@ -27,6 +52,9 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         [InlineKeyboardButton("📊 Language Statistics", callback_data='language_stats')],
         [InlineKeyboardButton("🔄 Reset All User Settings", callback_data='reset_settings')],
         [InlineKeyboardButton("📈 Usage Statistics", callback_data='usage_stats')],
+        [InlineKeyboardButton("🧮 Token Usage", callback_data='token_usage')],
+        [InlineKeyboardButton("🔎 Inline Statistics", callback_data='inline_stats')],
+        [InlineKeyboardButton("🔮 Pre-Translation Statistics", callback_data='speculative_stats')],
         [InlineKeyboardButton("🔍 Search User", callback_data='search_user')],
         [InlineKeyboardButton("📣 Broadcast Message", callback_data='broadcast')],
         [InlineKeyboardButton("👤 User Info", callback_data='user_info')],
@@ -34,7 +62,12 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         [InlineKeyboardButton("🌟 Add VIP User", callback_data='add_vip_user')],
         [InlineKeyboardButton("🔽 Remove VIP User", callback_data='remove_vip_user')],
         [InlineKeyboardButton("📋 List All Users", callback_data='list_users')],
-        [InlineKeyboardButton("📋 List User Translations", callback_data='list_user_translations')]
+        [InlineKeyboardButton("📋 List User Translations", callback_data='list_user_translations')],
+        [InlineKeyboardButton(f"🔥 CPU Profile ({PROFILE_DEFAULT_SECONDS}s)", callback_data='profile_cpu'),
+         InlineKeyboardButton("⏹ Stop CPU Profile", callback_data='profile_cpu_stop')],
+        [InlineKeyboardButton("🧠 Memory Snapshot", callback_data='profile_memory'),
+         InlineKeyboardButton("🧠 Stop Memory Tracing", callback_data='profile_memory_stop')],
+        [InlineKeyboardButton("🧵 Task Dump & Loop Lag", callback_data='profile_tasks')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text("👨‍💼 Admin Panel:", reply_markup=reply_markup)
@@ -51,6 +84,13 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text(confirmation)
         return
 
+    if query.data.startswith('profile_'):
+        if query.from_user.id not in ADMIN_USER_IDS:
+            await query.edit_message_text("🚫 You are not authorized to use profiling.")
+            return
+        await _handle_profiling(query.data, query, context)
+        return
+
     if query.data == 'user_count':
         count = len(user_settings)
         await query.edit_message_text(f"👥 Total users: {count}")
@@ -61,8 +101,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         text = "📊 Language statistics:\n" + "\n".join([f"{VALID_LANGUAGE_CODES.get(lang, lang)}: {count}" for lang, count in stats.items()])
         await query.edit_message_text(text)
     elif query.data == 'reset_settings':
-        user_settings.clear()
-        save_json(USER_SETTINGS_FILE, user_settings)
+        reset_user_languages()
         await query.edit_message_text("🔄 All user settings have been reset.")
     elif query.data == 'usage_stats':
         total = usage_stats["total_translations"]
@@ -71,6 +110,12 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         for date, count in daily.items():
             text += f"{date}: {count} translations\n"
         await query.edit_message_text(text)
+    elif query.data == 'token_usage':
+        await query.edit_message_text(token_report()[:4096])
+    elif query.data == 'inline_stats':
+        await query.edit_message_text(inline_report())
+    elif query.data == 'speculative_stats':
+        await query.edit_message_text(speculative_report())
     elif query.data == 'search_user':
         await query.edit_message_text("🔍 Please enter the user ID you want to search for:")
         context.user_data['admin_state'] = 'waiting_for_user_id'
@@ -99,6 +144,51 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("👤 Please enter the user ID to get the translation history:")
         context.user_data['admin_state'] = 'waiting_for_user_translations'
 
+async def _send_report(bot: Bot, chat_id: int, filename: str, text: str) -> None:
+    await bot.send_document(chat_id=chat_id, document=InputFile(io.BytesIO(text.encode()), filename=filename))
+
+async def _send_cpu_profile(bot: Bot, chat_id: int, seconds: float) -> None:
+    report = await run_cpu_profile(seconds)
+    if report is None:
+        await bot.send_message(chat_id=chat_id, text="⚠️ A CPU profile is already running.")
+        return
+    await _send_report(bot, chat_id, "cpu_profile.txt", report)
+
+async def _handle_profiling(action: str, query, context: ContextTypes.DEFAULT_TYPE) -> None:
+    chat_id = query.message.chat_id
+    if action == 'profile_cpu':
+        await query.edit_message_text(f"🔥 CPU profile running for {PROFILE_DEFAULT_SECONDS}s...")
+        context.application.create_task(_send_cpu_profile(context.bot, chat_id, PROFILE_DEFAULT_SECONDS))
+    elif action == 'profile_cpu_stop':
+        stopped = stop_cpu_profile()
+        await query.edit_message_text("⏹ CPU profile stopped, sending results..." if stopped else "No CPU profile is running.")
+    elif action == 'profile_memory':
+        await query.edit_message_text("🧠 Taking memory snapshot...")
+        report = await asyncio.to_thread(memory_snapshot)
+        await _send_report(context.bot, chat_id, "memory_snapshot.txt", report)
+    elif action == 'profile_memory_stop':
+        if memory_tracing_active():
+            stop_memory_tracing()
+            await query.edit_message_text("🧠 Memory tracing stopped.")
+        else:
+            await query.edit_message_text("Memory tracing is not active.")
+    elif action == 'profile_tasks':
+        await query.edit_message_text("🧵 Measuring event loop lag and collecting task stacks...")
+        await _send_report(context.bot, chat_id, "tasks.txt", await dump_tasks())
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Starts a CPU profile for N seconds (/profile [seconds]). Admins only."""
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("🚫 You are not authorized to use profiling.")
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await update.message.reply_text("⚠️ Usage: /profile [seconds]")
+        return
+    await update.message.reply_text(f"🔥 CPU profile running for {seconds:g}s...")
+    context.application.create_task(_send_cpu_profile(context.bot, update.effective_chat.id, seconds))
+
 async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if user_id not in ADMIN_USER_IDS:
@@ -115,20 +205,19 @@ async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         del context.user_data['admin_state']
     elif state == 'waiting_for_broadcast':
         broadcast_message = update.message.text
-        success_count = 0
-        for user_id in user_settings.keys():
-            try:
-                await context.bot.send_message(chat_id=int(user_id), text=broadcast_message)
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Failed to send broadcast to {user_id}: {e}")
-        await update.message.reply_text(f"Broadcast sent successfully to {success_count} out of {len(user_settings)} users.")
+        # Ein Job pro Empfänger: nach einem Neustart wird nur an die noch fehlenden Nutzer gesendet
+        broadcast_id = f"{update.message.chat_id}:{update.message.message_id}"
+        # Niedrige Priorität: Übersetzungen laufen vor dem Broadcast
+        added = await submit_jobs([("broadcast", {"chat_id": int(user_id), "text": broadcast_message},
+                                    f"broadcast:{broadcast_id}:{user_id}", PRIORITY_LOW)
+                                   for user_id in list(user_settings.keys())])
+        await update.message.reply_text(f"📣 Broadcast queued for {added} users.")
         del context.user_data['admin_state']
     elif state == 'waiting_for_user_info':
         user_id = update.message.text
         try:
-            if user_id in user_info:
-                user = user_info[user_id]
+            user = get_user_profile(user_id)
+            if user is not None:
                 language = user_settings.get(str(user_id), "Not set")
                 message = f"User Information for ID {user_id}:\n"
                 message += f"Username: @{user['username']}\n" if user['username'] else "Username: Not set\n"
@@ -167,23 +256,25 @@ async def handle_admin_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         del context.user_data['lang_change_user_id']
     elif state == 'waiting_for_vip_user_id':
         vip_user_id = str(update.message.text)
-        vip_users.add(vip_user_id)
-        save_json(VIP_USERS_FILE, list(vip_users))
-        await update.message.reply_text(f"User {vip_user_id} has been added to VIP users.")
+        if vip_user_id.isdigit():
+            set_vip(int(vip_user_id), True)
+            await update.message.reply_text(f"User {vip_user_id} has been added to VIP users.")
+        else:
+            await update.message.reply_text("Please send a numeric user ID.")
         del context.user_data['admin_state']
     elif state == 'waiting_for_remove_vip_user_id':
         vip_user_id = str(update.message.text)
         if vip_user_id in vip_users:
-            vip_users.remove(vip_user_id)
-            save_json(VIP_USERS_FILE, list(vip_users))
+            set_vip(vip_user_id, False)
             await update.message.reply_text(f"User {vip_user_id} has been removed from VIP users.")
         else:
             await update.message.reply_text(f"User {vip_user_id} is not a VIP user.")
         del context.user_data['admin_state']
     elif state == 'waiting_for_user_translations':
         user_id = update.message.text
-        if user_id in user_info:
-            translation_history = user_info[user_id].get("translation_history", [])
+        profile = get_user_profile(user_id)
+        if profile is not None:
+            translation_history = profile.get("translation_history", [])
             if translation_history:
                 history_text = f"📋 Translation history for user ID {user_id}:\n\n"
                 for i, translation in enumerate(translation_history):
@@ -1,7 +1,6 @@
 import threading
 import time
 import logging
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
@@ -14,14 +13,17 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 MODEL_NAME = 'gemini-pro'  # oder dein gewünschtes Modell
 
 class API_Checker(threading.Thread):
-    def __init__(self, api_key, interval=3600):  # Standardmäßig alle 60 Minuten (3600 Sekunden)
-        threading.Thread.__init__(self)
+    def __init__(self, api_key, interval=3600, initial_delay=30):  # Standardmäßig alle 60 Minuten (3600 Sekunden)
+        threading.Thread.__init__(self, daemon=True)  # Darf das Beenden des Prozesses nie blockieren
         self.api_key = api_key
         self.interval = interval
+        self.initial_delay = initial_delay  # Erster Check erst nach dem Start, nicht im kritischen Pfad
         self.api_available = True
         self.stop_event = threading.Event()  # Event zum Anhalten des Threads
 
     def run(self):
+        if self.stop_event.wait(self.initial_delay):
+            return
         while not self.stop_event.is_set():
             if self.check_api_availability():
                 logger.info("API is available.")
@@ -29,21 +31,23 @@ class API_Checker(threading.Thread):
             else:
                 logger.warning("API is unavailable.")
                 self.api_available = False
-            time.sleep(self.interval)
+            self.stop_event.wait(self.interval)
 
     def check_api_availability(self):
         try:
+            import google.generativeai as genai  # Schwerer Import, erst im Hintergrund-Thread laden
             genai.configure(api_key=self.api_key)
-            model = genai.GenerativeModel(MODEL_NAME)
-            response = model.generate_content("Test")
+            # Metadaten-Abfrage statt generate_content: prüft Key und Modell, ohne Tokens zu verbrauchen
+            genai.get_model(f"models/{MODEL_NAME}")
             return True  # API scheint zu funktionieren
         except Exception as e:
             logger.error(f"API check failed: {e}")
             return False
 
-    def stop(self):
-        self.stop_event.set()  # Thread sicher anhalten
-        self.join()  # Warten, bis der Thread beendet ist
+    def stop(self, timeout=None):
+        self.stop_event.set()  # Thread sicher anhalten, weckt auch ein laufendes wait()
+        if self.is_alive():
+            self.join(timeout)  # Warten, bis der Thread beendet ist (höchstens timeout Sekunden)
 
 if __name__ == '__main__':
     # Beispiel-Verwendung (zum Testen)
@@ -5,6 +5,7 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from user_management import is_vip
 from constants import ADMIN_USER_IDS
+from prompts import generate
 # from translator_bot import model # Absoluter Import wieder verwenden <- REMOVED
 
 logger = logging.getLogger(__name__)
@@ -32,8 +33,8 @@ async def handle_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     try:
         # Verwende das importierte Model-Objekt für Gemini-Anfragen
-        response = model.generate_content(user_message)
-        await update.message.reply_text(response.text)
+        response_text = generate(model, "chat", message=user_message)
+        await update.message.reply_text(response_text)
     except Exception as e:
         logger.error(f"Error in chat: {e}") # Logging hinzugefügt
         await update.message.reply_text(f"An error occurred: {str(e)}")
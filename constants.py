@@ -11,5 +11,59 @@ USER_SETTINGS_FILE = "user_settings.json"
 USAGE_STATS_FILE = "usage_stats.json"
 USER_INFO_FILE = "user_info.json"
 VIP_USERS_FILE = "vip_users.json"
+GROUP_SETTINGS_FILE = "group_settings.json"
 
-ADMIN_USER_IDS = [int(id.strip()) for id in os.getenv('ADMIN_USER_IDS', '').split(',')]
\ No newline at end of file
+ADMIN_USER_IDS = [int(id.strip()) for id in os.getenv('ADMIN_USER_IDS', '').split(',')]
+
+# Startzeit-Ziel für --profile-startup (Sekunden, ohne die verzögerte Modell-Initialisierung)
+STARTUP_TARGET_SECONDS = float(os.getenv('STARTUP_TARGET_SECONDS', 2.0))
+
+# Voice message translation
+VOICE_MAX_FILE_SIZE = int(os.getenv('VOICE_MAX_FILE_SIZE', 10 * 1024 * 1024))  # Bytes, Telegram-Voice-Notes sind Opus und klein
+VOICE_MAX_DURATION = int(os.getenv('VOICE_MAX_DURATION', 600))  # Sekunden
+VOICE_MAX_CONCURRENT_JOBS = int(os.getenv('VOICE_MAX_CONCURRENT_JOBS', 2))
+VOICE_MAX_CONCURRENT_CHUNKS = int(os.getenv('VOICE_MAX_CONCURRENT_CHUNKS', 4))
+VOICE_PROCESS_WORKERS = int(os.getenv('VOICE_PROCESS_WORKERS', 2))
+VOICE_SAMPLE_RATE = 16000
+VOICE_MAX_CHUNK_MS = 30 * 1000  # Längere Abschnitte werden hart geteilt
+VOICE_RECOGNIZER = os.getenv('VOICE_RECOGNIZER', 'google')
+VOICE_DEFAULT_LANGUAGE = os.getenv('VOICE_DEFAULT_LANGUAGE', 'en-US')  # Falls die Sprache des Absenders unbekannt ist
+
+# Group auto-translation
+GROUP_DEBOUNCE_SECONDS = float(os.getenv('GROUP_DEBOUNCE_SECONDS', 2.0))  # Ruhezeit, bevor ein Nachrichtenschwall übersetzt wird
+GROUP_MAX_DELAY_SECONDS = float(os.getenv('GROUP_MAX_DELAY_SECONDS', 6.0))  # Spätestens dann wird trotzdem übersetzt
+GROUP_MAX_BURST = int(os.getenv('GROUP_MAX_BURST', 10))
+
+# Inline mode
+INLINE_DEBOUNCE_SECONDS = float(os.getenv('INLINE_DEBOUNCE_SECONDS', 0.8))  # Tipp-Pause, bevor übersetzt wird
+INLINE_MIN_QUERY_LENGTH = 2
+INLINE_TOP_LANGUAGES = 3  # Zusätzlich zur Sprache des Nutzers angebotene Sprachen
+INLINE_PREFIX_MATCHES = 2  # Vorschläge aus dem Cache, die mit der Anfrage beginnen
+
+# Durable job queue
+JOB_QUEUE_FILE = "jobs.sqlite3"
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_LEASE_SECONDS = 120  # Wird während der Ausführung regelmäßig verlängert
+JOB_MAX_ATTEMPTS = 3
+JOB_RETENTION_SECONDS = 24 * 3600  # Erledigte Jobs so lange behalten (Idempotenz)
+SHUTDOWN_DEADLINE_SECONDS = float(os.getenv('SHUTDOWN_DEADLINE_SECONDS', 20))
+
+# Speculative pre-translation of channel posts
+SPECULATIVE_TOP_K = int(os.getenv('SPECULATIVE_TOP_K', 3))  # Häufigste Zielsprachen der Nutzer
+SPECULATIVE_HOURLY_QUOTA = int(os.getenv('SPECULATIVE_HOURLY_QUOTA', 100))  # Max. spekulative Jobs pro Stunde
+SPECULATIVE_MAX_CHARS = 4000  # Längere Posts werden nicht spekulativ übersetzt
+SPECULATIVE_MAX_WORKERS = 1  # Höchstens so viele Job-Worker für Vorab-Übersetzungen, der Rest bleibt für Nutzeranfragen frei
+
+# User index
+USER_FLUSH_INTERVAL = float(os.getenv('USER_FLUSH_INTERVAL', 60))  # Sekunden zwischen zwei Schreibvorgängen von user_info.json
+
+# Document translation
+DOCUMENT_EXTENSIONS = ('.txt', '.srt', '.md')
+DOCUMENT_MAX_FILE_SIZE = int(os.getenv('DOCUMENT_MAX_FILE_SIZE', 20 * 1024 * 1024))  # Bytes, Download-Limit der Bot-API
+DOCUMENT_MAX_CONCURRENT_SEGMENTS = int(os.getenv('DOCUMENT_MAX_CONCURRENT_SEGMENTS', 4))  # Parallele API-Aufrufe pro Datei
+DOCUMENT_SEGMENT_CHARS = 2000  # Absätze werden bis zu dieser Länge zu einem Abschnitt zusammengefasst
+DOCUMENT_BATCH_SEGMENTS = 20  # Kurze aufeinanderfolgende Abschnitte pro API-Aufruf (bis DOCUMENT_SEGMENT_CHARS Zeichen)
+DOCUMENT_MAX_SEGMENTS = int(os.getenv('DOCUMENT_MAX_SEGMENTS', 5000))  # Zu übersetzende Abschnitte pro Datei
+DOCUMENT_MAX_CHARS = int(os.getenv('DOCUMENT_MAX_CHARS', 500_000))  # Zu übersetzende Zeichen pro Datei
+DOCUMENT_PROGRESS_INTERVAL = 3.0  # Sekunden zwischen zwei Bearbeitungen der Fortschrittsnachricht
+DOCUMENT_WORK_DIR = "document_jobs"  # Download, Teilergebnis und Checkpoint pro Auftrag
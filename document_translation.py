@@ -0,0 +1,422 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from collections import deque
+
+from telegram import Bot
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()  # constants liest ADMIN_USER_IDS beim Import
+
+from constants import (
+    DOCUMENT_EXTENSIONS, DOCUMENT_MAX_FILE_SIZE, DOCUMENT_MAX_CONCURRENT_SEGMENTS, DOCUMENT_SEGMENT_CHARS,
+    DOCUMENT_BATCH_SEGMENTS, DOCUMENT_MAX_SEGMENTS, DOCUMENT_MAX_CHARS, DOCUMENT_PROGRESS_INTERVAL, DOCUMENT_WORK_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+class DocumentTranslationError(Exception):
+    """Custom exception for document-translation-related errors."""
+    pass
+
+# Dateien werden zeilenweise gelesen und in Abschnitte (prefix, text, suffix, end_offset) zerlegt.
+# Nur `text` wird übersetzt; prefix/suffix (Markdown-Markup, Zeilenumbrüche) und Abschnitte ohne Text
+# (SRT-Nummern und Zeitstempel, Code-Blöcke, Leerzeilen) werden unverändert übernommen.
+# end_offset ist die Position im Original nach dem Abschnitt und dient der Fortschrittsanzeige.
+
+_CHECKPOINT_INTERVAL = 1.0  # Sekunden zwischen zwei Checkpoints
+_WINDOW_PER_WORKER = 4  # Vorausgelesene Stapel pro paralleler Übersetzung, begrenzt den Speicher
+_MAX_BATCH_LENGTH = 4 * DOCUMENT_BATCH_SEGMENTS  # Abschnitte pro Stapel inkl. unübersetzter (z.B. SRT-Zeitstempel)
+
+_SRT_TIMING = re.compile(r'^\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}\s*-->\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}')
+_MD_FENCE = re.compile(r'^\s*(```|~~~)')
+_MD_BLOCK_PREFIX = re.compile(r'^(\s*(?:#{1,6}\s+|[-*+]\s+(?:\[[ xX]\]\s+)?|\d+[.)]\s+|>\s?)+)')
+_MD_TABLE_SPLIT = re.compile(r'(?<!\\)(\|)')  # Zellgrenzen, escapte Pipes gehören zum Zelltext
+_MD_PASSTHROUGH = re.compile(r'^\s*(?:([-*_])(?:\s*\1){2,}|\|?[\s:|-]*-[\s:|-]*\|?|<[^>]*>)\s*$')  # Linien, Tabellen-Trenner, HTML
+
+def _read_lines(path: str):
+    """Yields (line, end offset) pairs. Line endings are normalized to '\\n'."""
+    offset = 0
+    with open(path, 'rb') as f:
+        for raw_line in f:
+            offset += len(raw_line)
+            line = raw_line.decode('utf-8', errors='replace')
+            if offset == len(raw_line):
+                line = line.lstrip('\ufeff')  # BOM
+            if line.endswith('\r\n'):
+                line = line[:-2] + '\n'
+            yield line, offset
+
+def _text_segment(lines: list[str], end_offset: int, prefix: str = "") -> tuple:
+    text = "".join(lines)
+    body = text.rstrip()
+    leading = body[:len(body) - len(body.lstrip())]
+    return prefix + leading, body.lstrip(), text[len(body):], end_offset
+
+def _srt_segments(lines):
+    """Splits SRT subtitles: the text of each cue is one segment, numbers and timestamps are kept."""
+    cue = []
+    in_text = False
+    end_offset = 0
+    for line, offset in lines:
+        if in_text and line.strip():
+            cue.append(line)
+            end_offset = offset
+            continue
+        if cue:
+            yield _text_segment(cue, end_offset)
+            cue = []
+        in_text = bool(_SRT_TIMING.match(line.strip()))
+        yield line, "", "", offset
+    if cue:
+        yield _text_segment(cue, end_offset)
+
+def _txt_segments(lines):
+    """Splits plain text into blocks of whole paragraphs of about DOCUMENT_SEGMENT_CHARS characters."""
+    block = []
+    size = 0
+    end_offset = 0
+    for line, offset in lines:
+        # An Absatzgrenzen schneiden, notfalls (sehr lange Absätze) an Zeilengrenzen
+        if block and ((not line.strip() and size >= DOCUMENT_SEGMENT_CHARS) or size >= 2 * DOCUMENT_SEGMENT_CHARS):
+            yield _text_segment(block, end_offset)
+            block = []
+            size = 0
+        if block or line.strip():
+            block.append(line)
+            size += len(line)
+        else:
+            yield line, "", "", offset
+        end_offset = offset
+    if block:
+        yield _text_segment(block, end_offset)
+
+def _md_table_row_segments(line: str, offset: int):
+    """Splits a table row into one segment per cell; pipes and padding are kept."""
+    prefix = ""
+    for part in _MD_TABLE_SPLIT.split(line):
+        if part == "|" or not part.strip():
+            prefix += part
+            continue
+        body = part.strip()
+        start = part.index(body)
+        yield prefix + part[:start], body, "", offset
+        prefix = part[start + len(body):]
+    yield prefix, "", "", offset
+
+def _md_segments(lines):
+    """
+    Splits Markdown: paragraphs are segments, headings, list items and quotes are translated line by
+    line without their markup, table rows cell by cell without the pipes. Fenced code blocks, rules,
+    table separators and HTML lines are kept as they are.
+    """
+    paragraph = []
+    size = 0
+    end_offset = 0
+    in_fence = False
+    for line, offset in lines:
+        is_fence = bool(_MD_FENCE.match(line))
+        plain = not (in_fence or is_fence or not line.strip() or _MD_BLOCK_PREFIX.match(line)
+                     or _MD_PASSTHROUGH.match(line) or line.lstrip().startswith('|'))
+        if paragraph and (not plain or size >= DOCUMENT_SEGMENT_CHARS):
+            yield _text_segment(paragraph, end_offset)
+            paragraph = []
+            size = 0
+        end_offset = offset
+
+        if is_fence:
+            in_fence = not in_fence
+            yield line, "", "", offset
+        elif plain:
+            paragraph.append(line)
+            size += len(line)
+        elif in_fence or not line.strip() or _MD_PASSTHROUGH.match(line):
+            yield line, "", "", offset
+        elif line.lstrip().startswith('|'):
+            yield from _md_table_row_segments(line, offset)
+        else:
+            prefix = _MD_BLOCK_PREFIX.match(line)
+            prefix = prefix.group(1) if prefix else ""
+            yield _text_segment([line[len(prefix):]], offset, prefix)
+    if paragraph:
+        yield _text_segment(paragraph, end_offset)
+
+_SEGMENTERS = {'.srt': _srt_segments, '.txt': _txt_segments, '.md': _md_segments}
+
+def iter_segments(path: str, extension: str):
+    """
+    Parses a file as a stream of segments.
+
+    Args:
+        path: The path of the file.
+        extension: The file type ('.srt', '.txt' or '.md').
+
+    Returns:
+        An iterator of (prefix, text, suffix, end offset) tuples. Only `text` is translated.
+    """
+    return _SEGMENTERS[extension](_read_lines(path))
+
+def count_text(path: str, extension: str) -> tuple[int, int]:
+    """
+    Counts what would be translated in a file.
+
+    Returns:
+        The number of segments with text and their total number of characters.
+    """
+    segments = chars = 0
+    for _, text, _, _ in iter_segments(path, extension):
+        if text:
+            segments += 1
+            chars += len(text)
+    return segments, chars
+
+def _load_checkpoint(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"segments": 0, "output_bytes": 0}
+
+def _save_checkpoint(path: str, segments: int, output_bytes: int) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"segments": segments, "output_bytes": output_bytes}, f)
+    os.replace(temp_path, path)  # Atomar: nie ein halb geschriebener Checkpoint
+
+async def translate_file(source_path: str, output_path: str, checkpoint_path: str, extension: str, translate,
+                         concurrency: int = DOCUMENT_MAX_CONCURRENT_SEGMENTS, progress=None) -> int:
+    """
+    Translates a file segment by segment and writes the result in order while later segments are
+    still being translated. Short consecutive segments are sent together in one batch of up to
+    DOCUMENT_BATCH_SEGMENTS texts or DOCUMENT_SEGMENT_CHARS characters. Progress is checkpointed, so
+    a call after an interruption (error, restart) continues after the last written segment.
+
+    Args:
+        source_path: The file to translate.
+        output_path: The translated file. A partial file from an interrupted run is continued.
+        checkpoint_path: Where the progress is stored.
+        extension: The file type ('.srt', '.txt' or '.md').
+        translate: A blocking function translating a list of texts into a list of the same length;
+            it runs in worker threads.
+        concurrency: The maximum number of batches translated at the same time.
+        progress: An async function called with the fraction done, at most every DOCUMENT_PROGRESS_INTERVAL seconds (optional).
+
+    Returns:
+        The number of segments translated in this call.
+    """
+    checkpoint = _load_checkpoint(checkpoint_path)
+    written = checkpoint["segments"]
+    total_bytes = os.path.getsize(source_path) or 1
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = deque()  # type: deque[tuple[list[tuple], asyncio.Task | None]]
+    translated = 0
+    last_checkpoint = last_progress = time.monotonic()
+
+    async def run(texts: list[str]) -> list[str]:
+        async with semaphore:
+            return await asyncio.to_thread(translate, texts)
+
+    if written:
+        logger.info(f"Resuming {source_path} after {written} segment(s).")
+    with open(output_path, 'r+b' if os.path.exists(output_path) else 'wb') as output:
+        output.truncate(checkpoint["output_bytes"])  # Nach dem letzten Checkpoint Geschriebenes verwerfen
+        output.seek(checkpoint["output_bytes"])
+
+        async def write_ready(wait: bool) -> None:
+            nonlocal written, translated, last_checkpoint, last_progress
+            while pending and (wait or pending[0][1] is None or pending[0][1].done()):
+                batch, task = pending.popleft()
+                translations = iter(await task) if task is not None else None
+                for prefix, text, suffix, end_offset in batch:
+                    if text:
+                        text = next(translations)
+                        translated += 1
+                    output.write((prefix + text + suffix).encode('utf-8'))
+                written += len(batch)  # Ein Stapel wird immer ganz geschrieben (Checkpoint-Grenze)
+                wait = False  # Nur auf den ersten Abschnitt warten, danach alles Fertige schreiben
+                now = time.monotonic()
+                if now - last_checkpoint >= _CHECKPOINT_INTERVAL:
+                    output.flush()
+                    _save_checkpoint(checkpoint_path, written, output.tell())
+                    last_checkpoint = now
+                if progress is not None and now - last_progress >= DOCUMENT_PROGRESS_INTERVAL:
+                    last_progress = now
+                    await progress(end_offset / total_bytes)
+
+        async def submit(batch: list[tuple], texts: list[str]) -> None:
+            pending.append((batch, asyncio.create_task(run(texts)) if texts else None))
+            await write_ready(wait=len(pending) >= concurrency * _WINDOW_PER_WORKER)
+
+        try:
+            batch, texts, chars = [], [], 0
+            for segment in itertools.islice(iter_segments(source_path, extension), written, None):
+                if not segment[1] and not texts:
+                    await submit([segment], [])  # Unübersetztes vor dem ersten Text direkt durchreichen
+                    continue
+                batch.append(segment)
+                if segment[1]:
+                    texts.append(segment[1])
+                    chars += len(segment[1])
+                if (len(texts) >= DOCUMENT_BATCH_SEGMENTS or chars >= DOCUMENT_SEGMENT_CHARS
+                        or len(batch) >= _MAX_BATCH_LENGTH):
+                    await submit(batch, texts)
+                    batch, texts, chars = [], [], 0
+            if batch:
+                await submit(batch, texts)
+            while pending:
+                await write_ready(wait=True)
+        finally:
+            for _, task in pending:
+                if task is not None:
+                    task.cancel()
+            output.flush()
+            _save_checkpoint(checkpoint_path, written, output.tell())
+    return translated
+
+# --- Telegram ---
+
+def check_document(file_name: str | None, file_size: int | None) -> str:
+    """
+    Checks whether a document can be translated.
+
+    Returns:
+        The lowercase file extension.
+
+    Raises:
+        DocumentTranslationError: If the file type is not supported or the file is too large.
+    """
+    extension = os.path.splitext(file_name or "")[1].lower()
+    if extension not in DOCUMENT_EXTENSIONS:
+        raise DocumentTranslationError(f"Unsupported file type. Supported: {', '.join(DOCUMENT_EXTENSIONS)}")
+    if file_size and file_size > DOCUMENT_MAX_FILE_SIZE:
+        raise DocumentTranslationError(f"The file is too large (max. {DOCUMENT_MAX_FILE_SIZE // (1024 * 1024)} MB).")
+    return extension
+
+def _work_dir(work_id: str) -> str:
+    return os.path.join(DOCUMENT_WORK_DIR, work_id)
+
+async def translate_document(bot: Bot, file_id: str, file_name: str, file_size: int, work_id: str, translate,
+                             progress=None) -> str:
+    """
+    Downloads a document and translates it, resuming an earlier interrupted run with the same work ID.
+
+    Args:
+        bot: The bot used to download the file.
+        file_id: The Telegram file ID of the document.
+        file_name: The original file name.
+        file_size: The file size reported by Telegram.
+        work_id: A stable ID for the work directory, e.g. derived from the job ID.
+        translate: A blocking function translating a list of texts (see translate_file).
+        progress: An async function called with the fraction done (optional).
+
+    Returns:
+        The path of the translated file.
+
+    Raises:
+        DocumentTranslationError: If the document is not supported or has too much text.
+        TranslationError: If a segment cannot be translated. Progress up to that point is kept.
+    """
+    extension = check_document(file_name, file_size)
+    work_dir = _work_dir(work_id)
+    os.makedirs(work_dir, exist_ok=True)
+    source_path = os.path.join(work_dir, "source" + extension)
+    if not os.path.exists(source_path):
+        telegram_file = await bot.get_file(file_id)
+        await telegram_file.download_to_drive(source_path + ".download")
+        os.replace(source_path + ".download", source_path)
+
+    segments, chars = await asyncio.to_thread(count_text, source_path, extension)
+    if segments > DOCUMENT_MAX_SEGMENTS or chars > DOCUMENT_MAX_CHARS:
+        raise DocumentTranslationError(f"The document has too much text ({segments} sections, {chars} characters; "
+                                       f"max. {DOCUMENT_MAX_SEGMENTS} sections, {DOCUMENT_MAX_CHARS} characters).")
+
+    output_path = os.path.join(work_dir, "translated" + extension)
+    await translate_file(source_path, output_path, os.path.join(work_dir, "checkpoint.json"), extension,
+                         translate, progress=progress)
+    return output_path
+
+def remove_work_dir(work_id: str) -> None:
+    """Deletes the work directory of a finished document."""
+    shutil.rmtree(_work_dir(work_id), ignore_errors=True)
+
+def cleanup_work_dirs(max_age: float) -> int:
+    """
+    Deletes work directories of abandoned documents (e.g., jobs that finally failed).
+
+    Args:
+        max_age: The age in seconds after which a work directory is deleted.
+
+    Returns:
+        The number of deleted directories.
+    """
+    if not os.path.isdir(DOCUMENT_WORK_DIR):
+        return 0
+    removed = 0
+    for entry in os.scandir(DOCUMENT_WORK_DIR):
+        if entry.is_dir() and time.time() - entry.stat().st_mtime > max_age:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+# --- Benchmark ---
+
+def _write_sample(path: str, extension: str, target_bytes: int) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        i = 0
+        while f.tell() < target_bytes:
+            i += 1
+            if extension == '.srt':
+                f.write(f"{i}\n00:{i // 60 % 60:02d}:{i % 60:02d},000 --> 00:{i // 60 % 60:02d}:{i % 60:02d},900\n"
+                        f"<i>Subtitle line number {i}</i>\nand a second line.\n\n")
+            elif extension == '.md':
+                f.write(f"## Section {i}\n\nSome *emphasized* text in paragraph {i} with a [link](https://example.com).\n"
+                        f"It continues on a second line.\n\n- item one\n- item two\n\n```python\nprint({i})\n```\n\n")
+            else:
+                f.write(f"Paragraph {i}. " + "The quick brown fox jumps over the lazy dog. " * 8 + "\n\n")
+
+async def _run_benchmark(size_mb: float, latency: float, concurrency: int) -> list[str]:
+    """Translates generated files with a stub translator and reports the throughput."""
+    import tempfile
+    import tracemalloc
+
+    def stub_translate(texts: list[str]) -> list[str]:
+        if latency:
+            time.sleep(latency)  # Simuliert die API-Latenz
+        return [text.upper() for text in texts]
+
+    lines = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for extension in DOCUMENT_EXTENSIONS:
+            source_path = os.path.join(temp_dir, "sample" + extension)
+            _write_sample(source_path, extension, int(size_mb * 1024 * 1024))
+            output_path = os.path.join(temp_dir, "out" + extension)
+            checkpoint_path = os.path.join(temp_dir, "checkpoint" + extension)
+            tracemalloc.start()
+            start = time.perf_counter()
+            segments = await translate_file(source_path, output_path, checkpoint_path, extension, stub_translate, concurrency)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = os.path.getsize(source_path) / 1024 / 1024
+            lines.append(f"{extension:4} {size:6.1f} MiB, {segments:7d} segments, latency {latency * 1000:3.0f} ms, "
+                         f"concurrency {concurrency:2d}: {elapsed:6.2f}s, {size / elapsed:6.2f} MiB/s, "
+                         f"{segments / elapsed:8.0f} segments/s, peak memory {peak / 1024 / 1024:.1f} MiB")
+    return lines
+
+if __name__ == '__main__':
+    # python document_translation.py [größe_mb]
+    # 1. Parser- und Schreib-Durchsatz ohne Latenz, 2. Wirkung der Parallelität bei simulierter API-Latenz
+    import sys
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for line in asyncio.run(_run_benchmark(size_mb, 0.0, DOCUMENT_MAX_CONCURRENT_SEGMENTS)):
+        print(line)
+    for concurrency in (1, 4, 16):
+        for line in asyncio.run(_run_benchmark(0.05, 0.02, concurrency)):
+            print(line)
@@ -0,0 +1,459 @@
+import asyncio
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Prioritäten: höhere Werte werden zuerst bearbeitet
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, leased, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT
+);
+DROP INDEX IF EXISTS jobs_ready;
+-- Lease-Reihenfolge; available_at und kind im Index, damit die Suche ohne Tabellenzugriff auskommt
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, created_at, available_at, kind);
+CREATE INDEX IF NOT EXISTS jobs_lease_expires ON jobs (status, lease_expires);
+"""
+
+_current_attempt = contextvars.ContextVar("current_attempt", default=(1, 1))  # (Versuch, max. Versuche) des laufenden Jobs
+
+def is_final_attempt() -> bool:
+    """
+    Checks, from inside a job handler, whether the running job will be retried if it fails.
+
+    Returns:
+        True if this is the last attempt.
+    """
+    attempt, max_attempts = _current_attempt.get()
+    return attempt >= max_attempts
+
+class RetryJob(Exception):
+    """
+    Raised by a handler to run the job again after `delay` seconds without counting the attempt,
+    e.g. when a rate limit was hit.
+    """
+
+    def __init__(self, delay: float):
+        super().__init__(f"Retry in {delay:.0f}s")
+        self.delay = delay
+
+class Job:
+    """A job leased from the queue."""
+
+    def __init__(self, job_id: str, kind: str, payload: dict, attempts: int):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+class DurableQueue:
+    """
+    A persistent job queue backed by SQLite in WAL mode.
+
+    Jobs survive restarts: leased jobs whose worker died are handed out again once their
+    lease expires, and recover() returns leased jobs to the queue at startup (unless they used up
+    their attempts).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind: str, payload: dict, job_id: str = None, priority: int = PRIORITY_NORMAL) -> bool:
+        """
+        Adds a job to the queue. Enqueueing an existing job ID is a no-op, which makes retries idempotent.
+
+        Args:
+            kind: The job type, used to pick the handler.
+            payload: JSON-serializable job data.
+            job_id: A stable job ID (optional). A random ID is used if omitted.
+            priority: The job priority (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW).
+
+        Returns:
+            True if the job was added, False if a job with this ID already exists.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, payload, priority, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id or uuid.uuid4().hex, kind, json.dumps(payload), priority, now, now, now)
+            )
+        return cursor.rowcount == 1
+
+    def enqueue_many(self, jobs: list[tuple[str, dict, str | None, int]]) -> int:
+        """
+        Adds many jobs in a single transaction, e.g. the fan-out of a broadcast. Existing job IDs
+        are skipped as in enqueue().
+
+        Args:
+            jobs: (kind, payload, job_id, priority) tuples; job_id may be None.
+
+        Returns:
+            The number of jobs added.
+        """
+        now = time.time()
+        rows = [(job_id or uuid.uuid4().hex, kind, json.dumps(payload), priority, now, now, now)
+                for kind, payload, job_id, priority in jobs]
+        with self._lock:
+            changes = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (id, kind, payload, priority, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - changes
+
+    def lease(self, owner: str, lease_seconds: float, exclude_kinds=()) -> Job | None:
+        """
+        Leases the next runnable job: pending jobs and jobs whose lease has expired.
+
+        Args:
+            owner: The ID of the leasing worker.
+            lease_seconds: How long the lease is valid unless renewed.
+            exclude_kinds: Job types that must not be leased now (e.g., at their concurrency limit).
+
+        Returns:
+            The leased job, or None if no job is runnable.
+        """
+        now = time.time()
+        kind_filter = f" AND kind NOT IN ({', '.join('?' * len(exclude_kinds))})" if exclude_kinds else ""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Zwei getrennte Abfragen statt einer mit OR: so nutzt jede ihren Index, und die
+                # Prioritäts-Reihenfolge kommt aus dem Index (LIMIT 1 bricht früh ab, kein Sortieren)
+                found = self._conn.execute(
+                    "SELECT rowid FROM jobs WHERE status = 'leased' AND lease_expires < ?" + kind_filter
+                    + " LIMIT 1",
+                    (now, *exclude_kinds)
+                ).fetchone() or self._conn.execute(
+                    "SELECT rowid FROM jobs WHERE status = 'pending' AND available_at <= ?" + kind_filter
+                    + " ORDER BY priority DESC, created_at LIMIT 1",
+                    (now, *exclude_kinds)
+                ).fetchone()
+                if found is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                row = self._conn.execute("SELECT id, kind, payload, attempts FROM jobs WHERE rowid = ?",
+                                         found).fetchone()
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE rowid = ?",
+                    (owner, now + lease_seconds, now, found[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Job(row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extends the lease of a running job. Returns False if the lease was lost."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + lease_seconds, now, job_id, owner)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str) -> None:
+        """Marks a job as done. The row is kept so that the job ID stays idempotent."""
+        self._set_status(job_id, "done")
+
+    def fail(self, job_id: str, error: str, retry_in: float = None) -> None:
+        """
+        Records a failed attempt.
+
+        Args:
+            job_id: The job ID.
+            error: The error message.
+            retry_in: Seconds until the job may run again, or None to give up.
+        """
+        if retry_in is None:
+            self._set_status(job_id, "failed", error)
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (now + retry_in, error, now, job_id)
+            )
+
+    def release(self, job_id: str, delay: float = 0) -> None:
+        """
+        Returns an interrupted job to the queue without counting the attempt (checkpoint on shutdown,
+        rate limits).
+
+        Args:
+            job_id: The job ID.
+            delay: Seconds until the job may run again.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+                "attempts = MAX(attempts - 1, 0), updated_at = ? WHERE id = ? AND status = 'leased'",
+                (now + delay, now, job_id)
+            )
+
+    def recover(self, max_attempts: int) -> tuple[int, int]:
+        """
+        Returns all leased jobs to the queue. Call at startup, before any worker runs.
+
+        A leased job was interrupted by a crash; the interrupted run already counts as an attempt
+        (lease() counts it, only a clean shutdown gives it back). Jobs that used up their attempts
+        this way, e.g. because they crash the process, are marked as failed instead of replayed.
+
+        Args:
+            max_attempts: The number of attempts after which a job is given up.
+
+        Returns:
+            The number of jobs that will be replayed and the number of jobs given up.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, "
+                    "last_error = 'Interrupted by a crash or restart too often', updated_at = ? "
+                    "WHERE status = 'leased' AND attempts >= ?",
+                    (now, max_attempts)
+                ).rowcount
+                replayed = self._conn.execute(
+                    "UPDATE jobs SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE status = 'leased'",
+                    (now,)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return replayed, failed
+
+    def purge(self, older_than: float) -> int:
+        """Deletes finished jobs older than the given number of seconds."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> dict[str, int]:
+        """Returns the number of jobs per status."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _set_status(self, job_id: str, status: str, error: str = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (status, error, now, job_id)
+            )
+
+class JobWorker:
+    """
+    Runs queued jobs on the event loop with a fixed number of concurrent workers.
+
+    Handlers are coroutines taking the job payload. A handler that raises is retried with backoff
+    until max_attempts is reached; a handler raising RetryJob is retried after the given delay
+    without counting the attempt.
+    """
+
+    def __init__(self, queue: DurableQueue, concurrency: int = 4, lease_seconds: float = 120,
+                 max_attempts: int = 3, poll_interval: float = 5.0):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._handlers = {}
+        self._kind_limits = {}  # kind -> max. gleichzeitige Jobs dieses Typs
+        self._running_kinds = Counter()
+        self._paused_kinds = {}  # kind -> time.monotonic(), bis zu der keine Jobs dieses Typs geleast werden
+        self._tasks = []
+        self._running_jobs = {}  # type: dict[str, asyncio.Task]
+        self._wakeup = None
+        self._stopping = False
+
+    def register(self, kind: str, handler, max_concurrency: int = None) -> None:
+        """
+        Registers the handler for a job type.
+
+        Args:
+            kind: The job type.
+            handler: An async function taking the payload dict.
+            max_concurrency: The maximum number of workers running jobs of this type at the same
+                time (optional), so that background work cannot occupy all workers.
+        """
+        self._handlers[kind] = handler
+        if max_concurrency is not None:
+            self._kind_limits[kind] = max_concurrency
+
+    def pause_kind(self, kind: str, seconds: float) -> None:
+        """
+        Stops leasing jobs of a type for a while, e.g. after a rate limit. Their rows stay untouched
+        in the queue instead of being leased and released again.
+
+        Args:
+            kind: The job type.
+            seconds: How long to pause. An existing longer pause is kept.
+        """
+        self._paused_kinds[kind] = max(self._paused_kinds.get(kind, 0.0), time.monotonic() + seconds)
+
+    def _excluded_kinds(self) -> list[str]:
+        """Job types that must not be leased now: at their concurrency limit or paused."""
+        now = time.monotonic()
+        for kind in [kind for kind, until in self._paused_kinds.items() if until <= now]:
+            del self._paused_kinds[kind]
+        return [kind for kind, limit in self._kind_limits.items()
+                if self._running_kinds[kind] >= limit] + list(self._paused_kinds)
+
+    def submit(self, kind: str, payload: dict, job_id: str = None, priority: int = PRIORITY_NORMAL) -> bool:
+        """Enqueues a job and wakes up an idle worker. See DurableQueue.enqueue()."""
+        added = self.queue.enqueue(kind, payload, job_id, priority)
+        if added and self._wakeup is not None:
+            self._wakeup.set()
+        return added
+
+    async def submit_many(self, jobs: list[tuple[str, dict, str | None, int]]) -> int:
+        """
+        Enqueues many jobs in one transaction, off the event loop, and wakes up the workers.
+        See DurableQueue.enqueue_many().
+        """
+        added = await asyncio.to_thread(self.queue.enqueue_many, jobs)
+        if added and self._wakeup is not None:
+            self._wakeup.set()
+        return added
+
+    def start(self) -> None:
+        """Replays jobs interrupted by the last shutdown or crash and starts the workers."""
+        replayed, failed = self.queue.recover(self.max_attempts)
+        if replayed:
+            logger.info(f"Replaying {replayed} interrupted job(s).")
+        if failed:
+            logger.warning(f"Gave up {failed} job(s) that were interrupted on their last attempt.")
+        self._wakeup = asyncio.Event()
+        # Bewusst nicht über Application.create_task: deren stop() würde sonst auf die Endlosschleifen warten
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            job = self.queue.lease(self.owner, self.lease_seconds, self._excluded_kinds())
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                self.queue.fail(job.id, f"No handler for job type {job.kind}")
+                continue
+
+            task = asyncio.create_task(self._execute(handler, job))
+            self._running_jobs[job.id] = task
+            self._running_kinds[job.kind] += 1
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                pass  # shutdown() kümmert sich um den Job
+            finally:
+                self._running_jobs.pop(job.id, None)
+                self._running_kinds[job.kind] -= 1
+
+    async def _execute(self, handler, job: Job) -> None:
+        _current_attempt.set((job.attempts, self.max_attempts))  # Gilt nur in diesem Task
+        renew_task = asyncio.create_task(self._renew_lease(job.id))
+        try:
+            await handler(job.payload)
+            self.queue.complete(job.id)
+        except asyncio.CancelledError:
+            self.queue.release(job.id)  # Checkpoint: beim nächsten Start erneut ausführen
+            raise
+        except RetryJob as e:
+            self.queue.release(job.id, e.delay)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {e}")
+            retry_in = 2 ** job.attempts * 5 if job.attempts < self.max_attempts else None
+            self.queue.fail(job.id, str(e), retry_in)
+        finally:
+            renew_task.cancel()
+
+    async def _renew_lease(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not self.queue.renew(job_id, self.owner, self.lease_seconds):
+                logger.warning(f"Lost the lease for job {job_id}.")
+                return
+
+    async def shutdown(self, deadline: float) -> None:
+        """
+        Stops taking new jobs and waits up to `deadline` seconds for running jobs. Jobs still
+        running after that are cancelled and returned to the queue, to be replayed on the next start.
+
+        Args:
+            deadline: The maximum time to wait for running jobs, in seconds.
+        """
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        running = list(self._running_jobs.values())
+        if running:
+            logger.info(f"Waiting up to {deadline}s for {len(running)} running job(s).")
+            _, unfinished = await asyncio.wait(running, timeout=deadline)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning(f"Checkpointed {len(unfinished)} unfinished job(s) for replay.")
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.queue.close()
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+
+from telegram import Update, Message
+from telegram.ext import ContextTypes
+
+from translation_service import translate_multi, TranslationError
+from utils import save_json, split_message
+from constants import (
+    VALID_LANGUAGE_CODES, GROUP_SETTINGS_FILE, ADMIN_USER_IDS,
+    GROUP_DEBOUNCE_SECONDS, GROUP_MAX_DELAY_SECONDS, GROUP_MAX_BURST
+)
+from state import group_settings
+from user_management import get_user_language
+
+logger = logging.getLogger(__name__)
+
+# Nachrichtenschwälle pro Chat: erst übersetzen, wenn der Chat kurz ruhig ist
+_pending_messages = {}  # type: dict[int, list[Message]]
+_burst_started = {}  # type: dict[int, float]
+_debounce_tasks = {}  # type: dict[int, asyncio.Task]
+
+def _get_group(chat_id: int) -> dict:
+    return group_settings.setdefault(str(chat_id), {"enabled": False, "members": []})
+
+def get_group_languages(chat_id: int, exclude: str = None) -> list[str]:
+    """
+    Gets the languages chosen by the known members of a group.
+
+    Args:
+        chat_id: The ID of the group chat.
+        exclude: A language code to leave out (optional), usually the sender's language.
+
+    Returns:
+        The sorted list of language codes.
+    """
+    group = group_settings.get(str(chat_id))
+    if not group:
+        return []
+    languages = {get_user_language(int(member), default=None) for member in group["members"]}
+    languages.discard(None)
+    languages.discard(exclude)
+    return sorted(language for language in languages if language in VALID_LANGUAGE_CODES)
+
+async def autotranslate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Turns group auto-translation on or off (/autotranslate on|off). Group admins only."""
+    chat = update.effective_chat
+    user = update.effective_user
+    if chat.type not in ("group", "supergroup"):
+        await update.message.reply_text("⚠️ This command only works in groups.")
+        return
+
+    if user.id not in ADMIN_USER_IDS:
+        member = await context.bot.get_chat_member(chat.id, user.id)
+        if member.status not in ("administrator", "creator"):
+            await update.message.reply_text("🚫 Only group admins can change auto-translation.")
+            return
+
+    if not context.args or context.args[0].lower() not in ("on", "off"):
+        await update.message.reply_text("⚠️ Usage: /autotranslate on|off")
+        return
+
+    group = _get_group(chat.id)
+    group["enabled"] = context.args[0].lower() == "on"
+    if str(user.id) not in group["members"]:
+        group["members"].append(str(user.id))
+    save_json(GROUP_SETTINGS_FILE, group_settings)
+    status = "enabled" if group["enabled"] else "disabled"
+    await update.message.reply_text(f"🌐 Auto-translation {status}. Members can choose their language with /setlanguage in a private chat with me.")
+
+async def group_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Collects messages in groups with auto-translation enabled and schedules a debounced translation.
+    """
+    message = update.message
+    if message is None or not (message.text or message.caption):
+        return
+    chat_id = update.effective_chat.id
+    group = group_settings.get(str(chat_id))
+    if not group or not group["enabled"]:
+        return
+
+    member_id = str(update.effective_user.id)
+    if member_id not in group["members"]:
+        group["members"].append(member_id)
+        save_json(GROUP_SETTINGS_FILE, group_settings)
+
+    pending = _pending_messages.setdefault(chat_id, [])
+    pending.append(message)
+    now = time.monotonic()
+    burst_started = _burst_started.setdefault(chat_id, now)
+
+    task = _debounce_tasks.get(chat_id)
+    if len(pending) >= GROUP_MAX_BURST:
+        delay = 0.0
+    elif task is not None and now - burst_started >= GROUP_MAX_DELAY_SECONDS:
+        return  # Schwall dauert schon zu lange: den laufenden Timer nicht mehr verschieben
+    else:
+        delay = GROUP_DEBOUNCE_SECONDS
+
+    if task is not None:
+        task.cancel()
+    _debounce_tasks[chat_id] = context.application.create_task(_flush_after(chat_id, delay))
+
+async def _flush_after(chat_id: int, delay: float) -> None:
+    await asyncio.sleep(delay)
+    # Ab hier nicht mehr abbrechbar: neue Nachrichten starten einen neuen Schwall
+    _debounce_tasks.pop(chat_id, None)
+    _burst_started.pop(chat_id, None)
+    messages = _pending_messages.pop(chat_id, [])
+
+    # Gleiche Texte und Absender-Sprachen im Schwall nur einmal übersetzen
+    batches = {}  # type: dict[tuple[str, str], list[Message]]
+    for message in messages:
+        sender_language = get_user_language(message.from_user.id, default=None) if message.from_user else None
+        batches.setdefault((message.text or message.caption, sender_language), []).append(message)
+
+    await asyncio.gather(*(_translate_batch(chat_id, text, sender_language, batch)
+                           for (text, sender_language), batch in batches.items()))
+
+async def _translate_batch(chat_id: int, text: str, sender_language: str | None, messages: list[Message]) -> None:
+    target_languages = get_group_languages(chat_id, exclude=sender_language)
+    if not target_languages:
+        return
+    try:
+        translations = await asyncio.to_thread(translate_multi, text, target_languages)
+    except TranslationError as e:
+        logger.error(f"Group translation failed in chat {chat_id}: {e}")
+        return
+
+    reply = "🌐 " + "\n\n".join(f"{VALID_LANGUAGE_CODES[language]}:\n{translated_text}"
+                               for language, translated_text in translations.items() if translated_text)
+    for message in messages:
+        try:
+            for part in split_message(reply):
+                await message.reply_text(part)
+        except Exception as e:
+            logger.error(f"Failed to send group translation in chat {chat_id}: {e}")
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+
+from telegram import Update, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import ContextTypes
+
+from translation_service import translate_multi, get_cached_translation, find_cached_translations, TranslationError
+from user_management import get_user_language, get_top_languages
+from constants import (
+    VALID_LANGUAGE_CODES, INLINE_DEBOUNCE_SECONDS, INLINE_MIN_QUERY_LENGTH, INLINE_TOP_LANGUAGES, INLINE_PREFIX_MATCHES
+)
+
+logger = logging.getLogger(__name__)
+
+# dropped: verworfen, bevor übersetzt wurde (Tipp-Pause nicht abgewartet oder zu kurz)
+# cancelled: laufende Übersetzung durch eine neuere Anfrage ersetzt
+inline_stats = {"queries": 0, "dropped": 0, "cancelled": 0, "cache_hits": 0, "translated": 0, "failed": 0}
+
+class _InlineRequest:
+    """The pending inline query of one user."""
+
+    def __init__(self, query: InlineQuery):
+        self.query = query
+        self.stage = "debounce"  # debounce -> translating -> answering
+        self.task = None
+
+_pending_requests = {}  # type: dict[int, _InlineRequest]
+
+def _inline_languages(user_id: int) -> list[str]:
+    languages = [get_user_language(user_id)]
+    for language in get_top_languages(INLINE_TOP_LANGUAGES + 1):
+        if language not in languages and len(languages) <= INLINE_TOP_LANGUAGES:
+            languages.append(language)
+    return [language for language in languages if language in VALID_LANGUAGE_CODES]
+
+def _build_results(text: str, languages: list[str], translations: dict[str, str]) -> list[InlineQueryResultArticle]:
+    results = []
+    for language in languages:
+        translated_text = translations.get(language)
+        if translated_text:
+            results.append(InlineQueryResultArticle(
+                id=language,
+                title=f"🌐 {VALID_LANGUAGE_CODES[language]}",
+                description=translated_text[:100],
+                input_message_content=InputTextMessageContent(translated_text),
+            ))
+
+    # Vorschläge in der Sprache des Nutzers: bereits übersetzte Texte, die mit der Eingabe beginnen
+    matches = find_cached_translations(text, languages[0], INLINE_PREFIX_MATCHES + 1)
+    suggestions = [(original, translated_text) for original, translated_text in matches if original != text]
+    for i, (original, translated_text) in enumerate(suggestions[:INLINE_PREFIX_MATCHES]):
+        results.append(InlineQueryResultArticle(
+            id=f"prefix{i}",
+            title=f"💡 {original[:60]}",
+            description=translated_text[:100],
+            input_message_content=InputTextMessageContent(translated_text),
+        ))
+    return results
+
+async def _answer(query: InlineQuery, text: str, languages: list[str], translations: dict[str, str]) -> None:
+    try:
+        await query.answer(_build_results(text, languages, translations), cache_time=300, is_personal=True)
+    except Exception as e:
+        logger.warning(f"Failed to answer inline query: {e}")  # z.B. Anfrage bereits abgelaufen
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handles inline queries (@bot text).
+
+    Telegram sends a new query on almost every keystroke, so translations are debounced per user and a
+    newer query cancels the older one. Fully cached queries are answered immediately.
+    """
+    query = update.inline_query
+    user_id = query.from_user.id
+    text = query.query.strip()
+    inline_stats["queries"] += 1
+
+    previous = _pending_requests.pop(user_id, None)
+    if previous is not None:
+        inline_stats["dropped" if previous.stage == "debounce" else "cancelled"] += 1
+        previous.task.cancel()
+
+    if len(text) < INLINE_MIN_QUERY_LENGTH:
+        inline_stats["dropped"] += 1
+        return
+
+    languages = _inline_languages(user_id)
+    if not languages:
+        return
+    cached = {language: get_cached_translation(text, language) for language in languages}
+    if all(cached.values()):
+        inline_stats["cache_hits"] += 1
+        await _answer(query, text, languages, cached)
+        return
+
+    request = _InlineRequest(query)
+    request.task = context.application.create_task(_translate_after_pause(user_id, request, text, languages))
+    _pending_requests[user_id] = request
+
+async def _translate_after_pause(user_id: int, request: _InlineRequest, text: str, languages: list[str]) -> None:
+    try:
+        await asyncio.sleep(INLINE_DEBOUNCE_SECONDS)
+        request.stage = "translating"
+        # Ein Abbruch stoppt nur das Warten; der Thread läuft zu Ende und füllt den Cache für spätere Anfragen
+        translations = await asyncio.to_thread(translate_multi, text, languages)
+        request.stage = "answering"
+        await _answer(request.query, text, languages, translations)
+        inline_stats["translated"] += 1
+    except TranslationError as e:
+        inline_stats["failed"] += 1
+        logger.error(f"Inline translation failed: {e}")
+    finally:
+        if _pending_requests.get(user_id) is request:
+            del _pending_requests[user_id]
+
+def inline_report() -> str:
+    """
+    Formats the inline query statistics.
+
+    Returns:
+        A human-readable report.
+    """
+    stats = inline_stats
+    return (f"🔎 Inline queries: {stats['queries']}\n"
+            f"Served from cache: {stats['cache_hits']}\n"
+            f"Translated: {stats['translated']}\n"
+            f"Dropped (still typing): {stats['dropped']}\n"
+            f"Cancelled (superseded): {stats['cancelled']}\n"
+            f"Failed: {stats['failed']}")
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from functools import partial
+
+from telegram import Bot, User, InputFile, ReplyParameters
+from telegram.error import Forbidden, BadRequest, RetryAfter
+
+from durable_queue import DurableQueue, JobWorker, RetryJob, PRIORITY_NORMAL, is_final_attempt
+from translation_service import translate_text, translate_batch, text_to_speech, get_cached_translation, TranslationError
+from voice_translation import translate_voice, VoiceTranslationError
+from document_translation import translate_document, remove_work_dir, cleanup_work_dirs, DocumentTranslationError
+from user_management import update_user_info, add_translation_history
+from usage_stats import update_usage_stats, record_forward_latency
+from utils import split_message
+from constants import (
+    JOB_QUEUE_FILE, JOB_WORKERS, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETENTION_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Alle aufwendigen Arbeiten (Übersetzung, Sprache, Dokumente, TTS, Broadcast) laufen über die persistente Queue,
+# damit sie einen Neustart überstehen. Die Handler erhalten nur JSON-Daten, keine Update-Objekte.
+
+_worker = None  # JobWorker instance, private
+_job_handlers = {}  # Von anderen Modulen registrierte Handler: kind -> (async handler(payload), max_concurrency)
+
+def register_job_handler(kind: str, handler, max_concurrency: int = None) -> None:
+    """
+    Registers a job handler from another module. Handlers are attached when the workers start.
+
+    Args:
+        kind: The job type.
+        handler: An async function taking the payload dict.
+        max_concurrency: The maximum number of workers running jobs of this type at once (optional).
+    """
+    _job_handlers[kind] = (handler, max_concurrency)
+
+def get_job_worker() -> JobWorker:
+    """Singleton pattern to get the job worker and its queue."""
+    global _worker
+    if _worker is None:
+        _worker = JobWorker(DurableQueue(JOB_QUEUE_FILE), JOB_WORKERS, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+    return _worker
+
+def submit_job(kind: str, payload: dict, job_id: str = None, priority: int = PRIORITY_NORMAL) -> bool:
+    """
+    Queues a job for background processing.
+
+    Args:
+        kind: The job type (e.g., 'translate_forward').
+        payload: JSON-serializable job data.
+        job_id: A stable job ID (optional); a job with an existing ID is not queued again.
+        priority: The job priority.
+
+    Returns:
+        True if the job was queued, False if it already existed.
+    """
+    return get_job_worker().submit(kind, payload, job_id, priority)
+
+async def submit_jobs(jobs: list[tuple[str, dict, str | None, int]]) -> int:
+    """
+    Queues many jobs at once in a single transaction, without blocking the event loop.
+
+    Args:
+        jobs: (kind, payload, job_id, priority) tuples, see submit_job().
+
+    Returns:
+        The number of jobs queued.
+    """
+    return await get_job_worker().submit_many(jobs)
+
+def start_jobs(bot: Bot) -> None:
+    """Registers the job handlers, replays interrupted jobs and starts the workers."""
+    worker = get_job_worker()
+    worker.register("translate_forward", partial(_translate_forward, bot))
+    worker.register("translate_voice", partial(_translate_voice, bot))
+    worker.register("tts", partial(_tts, bot))
+    # Broadcasts nur nacheinander: sie sollen Übersetzungen nicht verdrängen und das Flood-Limit nicht reizen
+    worker.register("broadcast", partial(_broadcast, bot), max_concurrency=1)
+    # Ein Dokument nach dem anderen: eine große Datei soll nicht alle Worker und das API-Kontingent belegen
+    worker.register("translate_document", partial(_translate_document, bot), max_concurrency=1)
+    for kind, (handler, max_concurrency) in _job_handlers.items():
+        worker.register(kind, handler, max_concurrency)
+    worker.queue.purge(JOB_RETENTION_SECONDS)
+    cleanup_work_dirs(JOB_RETENTION_SECONDS)
+    worker.start()
+
+async def stop_jobs(deadline: float) -> None:
+    """Drains running jobs within the deadline and checkpoints the rest for replay."""
+    if _worker is not None:
+        await _worker.shutdown(deadline)
+
+async def _reply(bot: Bot, chat_id: int, message_id: int, text: str) -> None:
+    # allow_sending_without_reply: beim Replay kann die Ursprungsnachricht bereits gelöscht sein
+    reply_parameters = ReplyParameters(message_id=message_id, allow_sending_without_reply=True)
+    for part in split_message(text):
+        await bot.send_message(chat_id=chat_id, text=part, reply_parameters=reply_parameters)
+
+async def _translate_forward(bot: Bot, payload: dict) -> None:
+    cache_hit = get_cached_translation(payload["text"], payload["target_language"], payload["source_language"]) is not None
+    try:
+        translated_text = await asyncio.to_thread(
+            translate_text, payload["text"], payload["target_language"], payload["source_language"]
+        )
+    except TranslationError as e:
+        logger.error(f"Translation error: {e}")
+        await _reply(bot, payload["chat_id"], payload["message_id"], f"Error: Translation failed. Please try again later. {e}")
+        return
+
+    user = User.de_json(payload["user"], bot)
+    update_user_info(user)
+    add_translation_history(user.id, payload["text"], translated_text)
+    response = f"Original sender: {payload['original_sender']}\n\n🔤 Translation:\n\n{translated_text}"
+    await _reply(bot, payload["chat_id"], payload["message_id"], response)
+    if "received_at" in payload:
+        record_forward_latency(time.time() - payload["received_at"], cache_hit)
+    update_usage_stats()
+
+async def _translate_voice(bot: Bot, payload: dict) -> None:
+    try:
+        transcript, translated_text = await translate_voice(
+            bot, payload["file_id"], payload["target_language"], payload["source_language"],
+            payload["file_size"], payload["duration"]
+        )
+    except VoiceTranslationError as e:
+        logger.warning(f"Voice translation error: {e}")
+        await _reply(bot, payload["chat_id"], payload["message_id"], f"Error: {e}")
+        return
+    except TranslationError as e:
+        logger.error(f"Translation error: {e}")
+        await _reply(bot, payload["chat_id"], payload["message_id"], f"Error: Translation failed. Please try again later. {e}")
+        return
+
+    response = f"Original sender: {payload['original_sender']}\n\n🎙️ Transcript:\n\n{transcript}\n\n🔤 Translation:\n\n{translated_text}"
+    await _reply(bot, payload["chat_id"], payload["message_id"], response)
+    update_usage_stats()
+    update_user_info(User.de_json(payload["user"], bot))
+
+async def _edit_progress(bot: Bot, payload: dict, text: str) -> None:
+    try:
+        await bot.edit_message_text(chat_id=payload["chat_id"], message_id=payload["progress_message_id"], text=text)
+    except BadRequest as e:
+        logger.debug(f"Could not update progress message: {e}")  # z.B. unverändert oder gelöscht
+
+async def _translate_document(bot: Bot, payload: dict) -> None:
+    # translate_batch cacht nicht: große Dateien würden den Übersetzungs-Cache fluten
+    translate = partial(translate_batch, target_language=payload["target_language"])
+    name = payload["file_name"]
+    last_fraction = 0.0
+
+    async def progress(fraction: float) -> None:
+        nonlocal last_fraction
+        last_fraction = fraction
+        await _edit_progress(bot, payload, f"📄 Translating {name}: {fraction:.0%}")
+
+    try:
+        output_path = await translate_document(bot, payload["file_id"], name, payload["file_size"],
+                                               payload["work_id"], translate, progress)
+        stem, extension = os.path.splitext(name)
+        with open(output_path, 'rb') as f:
+            await bot.send_document(chat_id=payload["chat_id"], document=InputFile(f, filename=f"{stem}.{payload['target_language']}{extension}"),
+                                    reply_parameters=ReplyParameters(message_id=payload["message_id"],
+                                                                     allow_sending_without_reply=True))
+    except DocumentTranslationError as e:
+        await _edit_progress(bot, payload, f"Error: {e}")
+        remove_work_dir(payload["work_id"])
+        return
+    except Exception as e:
+        logger.error(f"Document translation error: {e}")
+        if is_final_attempt():
+            await _edit_progress(bot, payload, f"Error: Translation of {name} failed at {last_fraction:.0%}. Please try again later.")
+            remove_work_dir(payload["work_id"])
+        else:
+            # Erneuter Versuch durch die Job-Queue, ab dem letzten Checkpoint
+            await _edit_progress(bot, payload, f"⚠️ Translation of {name} interrupted at {last_fraction:.0%}, retrying from there.")
+        raise
+    await _edit_progress(bot, payload, f"✅ Translated {name}.")
+    remove_work_dir(payload["work_id"])
+    update_usage_stats()
+    update_user_info(User.de_json(payload["user"], bot))
+
+async def _tts(bot: Bot, payload: dict) -> None:
+    try:
+        translated_text = await asyncio.to_thread(translate_text, payload["text"], payload["target_language"])
+    except TranslationError as e:
+        logger.error(f"Translation error in TTS: {e}")
+        await _reply(bot, payload["chat_id"], payload["message_id"], "An error occurred while generating audio.")
+        return
+
+    audio_file = await asyncio.to_thread(text_to_speech, translated_text, payload["target_language"])
+    if not audio_file:
+        await _reply(bot, payload["chat_id"], payload["message_id"], "An error occurred while generating audio.")
+        return
+    try:
+        with open(audio_file, 'rb') as f:
+            await bot.send_audio(chat_id=payload["chat_id"], audio=InputFile(f), title="Text to Speech",
+                                 reply_parameters=ReplyParameters(message_id=payload["message_id"],
+                                                                  allow_sending_without_reply=True))
+    finally:
+        os.remove(audio_file)
+
+async def _broadcast(bot: Bot, payload: dict) -> None:
+    try:
+        await bot.send_message(chat_id=payload["chat_id"], text=payload["text"])
+    except RetryAfter as e:
+        # Flood-Limit von Telegram: kein Fehlversuch, sondern später erneut senden
+        retry_after = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else e.retry_after
+        # Alle Broadcasts pausieren: der Worker least sie bis dahin gar nicht erst
+        get_job_worker().pause_kind("broadcast", retry_after)
+        logger.warning(f"Broadcast hit the flood limit, pausing for {retry_after:.0f}s.")
+        raise RetryJob(retry_after)
+    except (Forbidden, BadRequest) as e:
+        logger.error(f"Failed to send broadcast to {payload['chat_id']}: {e}")  # Bot blockiert o.ä., kein Retry
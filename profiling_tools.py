@@ -0,0 +1,228 @@
+import asyncio
+import io
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Laufzeit-Diagnose für das Admin-Panel. Solange nichts gestartet wird, entstehen keine Kosten:
+# Der Sampler-Thread existiert nur während eines Profils, tracemalloc läuft nur nach Aktivierung.
+
+PROFILE_SAMPLE_INTERVAL = 0.005  # Sekunden zwischen zwei Stichproben
+PROFILE_MAX_SECONDS = 300
+LOOP_LAG_PROBE_SECONDS = 1.0
+
+class SamplingProfiler:
+    """
+    A sampling CPU profiler: a background thread records the stacks of all other threads at a fixed interval.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # collapsed stack -> samples
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self, seconds: float) -> None:
+        """Samples for `seconds` or until stop() is called. Blocks, so run it in a thread."""
+        own_id = threading.get_ident()
+        self.started_at = time.time()
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline and not self._stop_event.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+            self._stop_event.wait(self.interval)
+        self.duration = time.perf_counter() - start
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def report(self, limit: int = 40) -> str:
+        """
+        Formats the profile: the functions with the most samples, followed by all stacks in collapsed
+        format (one 'frame;frame;frame count' line per stack, usable with flamegraph.pl or speedscope).
+        """
+        self_samples = Counter()
+        for stack, count in self.stacks.items():
+            self_samples[stack.rsplit(";", 1)[-1]] += count
+        total = sum(self.stacks.values()) or 1
+
+        lines = [f"CPU profile: {self.samples} samples over {self.duration:.1f}s "
+                 f"(interval {self.interval * 1000:.0f} ms)", "", "Top frames by self samples:"]
+        for frame, count in self_samples.most_common(limit):
+            lines.append(f"{count / total:7.1%} {count:7d}  {frame}")
+        lines += ["", "Collapsed stacks:"]
+        lines += [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines)
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+_active_profiler = None  # Laufendes CPU-Profil, höchstens eines gleichzeitig
+
+async def run_cpu_profile(seconds: float) -> str | None:
+    """
+    Runs a sampling CPU profile for up to `seconds` seconds.
+
+    Returns:
+        The profile report, or None if another profile is already running.
+    """
+    global _active_profiler
+    if _active_profiler is not None:
+        return None
+    _active_profiler = SamplingProfiler()
+    try:
+        await asyncio.to_thread(_active_profiler.run, min(seconds, PROFILE_MAX_SECONDS))
+        return _active_profiler.report()
+    finally:
+        _active_profiler = None
+
+def stop_cpu_profile() -> bool:
+    """Stops the running CPU profile early. Returns False if none is running."""
+    if _active_profiler is None:
+        return False
+    _active_profiler.stop()
+    return True
+
+# --- Memory ---
+
+_watched_containers = {}  # name -> callable returning the container
+_last_snapshot = None
+_last_container_sizes = {}
+
+def watch_container(name: str, getter) -> None:
+    """
+    Registers a container whose size is included in memory snapshots.
+
+    Args:
+        name: The name shown in the report (e.g., '_translation_cache').
+        getter: A function returning the container. Objects with an nbytes() method report their own size.
+    """
+    _watched_containers[name] = getter
+
+def _deep_sizeof(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):  # Kopie: der Event-Loop kann parallel schreiben
+            size += _deep_sizeof(key, seen) + _deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in list(obj):
+            size += _deep_sizeof(item, seen)
+    return size
+
+def _container_sizes() -> dict[str, tuple[int, int]]:
+    sizes = {}
+    for name, getter in _watched_containers.items():
+        container = getter()
+        size = container.nbytes() if hasattr(container, "nbytes") else _deep_sizeof(container, set())
+        sizes[name] = (len(container), size)
+    return sizes
+
+def memory_tracing_active() -> bool:
+    return tracemalloc.is_tracing()
+
+def stop_memory_tracing() -> None:
+    """Stops tracemalloc and forgets the baseline snapshot."""
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+
+def memory_snapshot(limit: int = 25) -> str:
+    """
+    Takes a memory snapshot. The first call starts tracemalloc and records a baseline; every later
+    call reports the largest allocations and the difference to the previous snapshot.
+
+    Blocks for large heaps, so run it in a thread.
+
+    Returns:
+        The memory report.
+    """
+    global _last_snapshot, _last_container_sizes
+    lines = []
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        lines.append("tracemalloc started; this is the baseline. Take another snapshot to see the growth.\n")
+
+    sizes = _container_sizes()
+    lines.append("Watched containers (entries, deep size, change since last snapshot):")
+    for name, (entries, size) in sorted(sizes.items(), key=lambda item: item[1][1], reverse=True):
+        previous_entries, previous_size = _last_container_sizes.get(name, (entries, size))
+        lines.append(f"{name}: {entries} entries, {size / 1024:.1f} KiB "
+                     f"({entries - previous_entries:+d} entries, {(size - previous_size) / 1024:+.1f} KiB)")
+    _last_container_sizes = sizes
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append(f"\nTraced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)")
+
+    if _last_snapshot is not None:
+        lines.append("\nGrowth since last snapshot:")
+        for stat in snapshot.compare_to(_last_snapshot, "lineno")[:limit]:
+            lines.append(str(stat))
+    lines.append("\nLargest allocations:")
+    for stat in snapshot.statistics("lineno")[:limit]:
+        lines.append(str(stat))
+    _last_snapshot = snapshot
+    return "\n".join(lines)
+
+# --- Event Loop ---
+
+async def measure_loop_lag(seconds: float = LOOP_LAG_PROBE_SECONDS, probe_interval: float = 0.01) -> tuple[float, float]:
+    """
+    Measures how late the event loop wakes up sleeping coroutines.
+
+    Returns:
+        A tuple of (mean lag, max lag) in seconds.
+    """
+    lags = []
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        start = loop.time()
+        await asyncio.sleep(probe_interval)
+        lags.append(loop.time() - start - probe_interval)
+    return sum(lags) / len(lags), max(lags)
+
+async def dump_tasks() -> str:
+    """
+    Reports event loop lag and the stacks of all asyncio tasks and threads.
+
+    Returns:
+        The report text.
+    """
+    mean_lag, max_lag = await measure_loop_lag()
+    lines = [f"Event loop lag over {LOOP_LAG_PROBE_SECONDS:.0f}s: mean {mean_lag * 1000:.1f} ms, max {max_lag * 1000:.1f} ms", ""]
+
+    tasks = asyncio.all_tasks()
+    lines.append(f"{len(tasks)} asyncio tasks:\n")
+    for task in sorted(tasks, key=lambda task: task.get_name()):
+        buffer = io.StringIO()
+        task.print_stack(file=buffer)
+        lines.append(f"--- {task.get_name()} ({task.get_coro().__qualname__ if task.get_coro() else '?'})")
+        lines.append(buffer.getvalue())
+
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines.append(f"\n{len(thread_names)} threads:\n")
+    for thread_id, frame in sys._current_frames().items():
+        lines.append(f"--- {thread_names.get(thread_id, thread_id)}")
+        lines.append(_collapse(frame).replace(";", "\n  "))
+    return "\n".join(lines)
@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import threading
+import time
+from textwrap import dedent
+
+logger = logging.getLogger(__name__)
+
+# Token-Zählung: 'local' schätzt ohne API-Aufruf, 'api' nutzt den count_tokens-Endpunkt.
+# Liefert die Antwort usage_metadata, werden immer die exakten Werte daraus verwendet.
+PROMPT_TOKEN_COUNTING = os.getenv('PROMPT_TOKEN_COUNTING', 'local')
+
+class PromptTemplate:
+    """A versioned prompt template for one task."""
+
+    def __init__(self, task: str, version: str, template: str):
+        self.task = task
+        self.version = version
+        self.template = dedent(template).strip()
+
+    @property
+    def key(self) -> str:
+        return f"{self.task}/{self.version}"
+
+    def render(self, **fields) -> str:
+        """
+        Fills in the template fields.
+
+        Args:
+            **fields: The values for the placeholders in the template.
+
+        Returns:
+            The prompt text.
+        """
+        return self.template.format(**fields)
+
+_registry = {}  # type: dict[tuple[str, str], PromptTemplate]
+
+# Aktive Version pro Aufgabe, überschreibbar mit z.B. PROMPT_VERSION_TRANSLATE=v1
+ACTIVE_VERSIONS = {
+    "detect": "v2",
+    "translate": "v2",
+    "verify": "v3",
+    "translate_multi": "v1",
+    "translate_batch": "v1",
+    "tts": "v2",
+    "chat": "v1",
+}
+
+def register_prompt(task: str, version: str, template: str) -> PromptTemplate:
+    """
+    Registers a prompt template.
+
+    Args:
+        task: The task name (e.g., 'translate').
+        version: The template version (e.g., 'v2').
+        template: The template text with str.format placeholders.
+
+    Returns:
+        The registered template.
+    """
+    prompt = PromptTemplate(task, version, template)
+    _registry[(task, version)] = prompt
+    return prompt
+
+def get_prompt(task: str, version: str = None) -> PromptTemplate:
+    """
+    Gets a prompt template.
+
+    Args:
+        task: The task name.
+        version: The template version (optional). Defaults to the active version of the task.
+
+    Returns:
+        The prompt template.
+
+    Raises:
+        KeyError: If no such template is registered.
+    """
+    if version is None:
+        version = os.getenv(f"PROMPT_VERSION_{task.upper()}", ACTIVE_VERSIONS[task])
+    return _registry[(task, version)]
+
+def list_prompts(task: str = None) -> list[PromptTemplate]:
+    """Returns all registered templates, optionally only those of one task."""
+    return [prompt for (prompt_task, _), prompt in sorted(_registry.items()) if task is None or prompt_task == task]
+
+# --- Templates ---
+# v1: die ursprünglichen, ausführlichen Prompts (für Vergleiche im Benchmark)
+# v2: kompakte Prompts, der Eingabetext kommt nur einmal vor
+
+register_prompt("detect", "v1", """
+    Task: Detect the language of the following text.
+
+    Instructions:
+    1. Analyze the text thoroughly to identify the language used.
+    2. Respond with the language code of the detected language.
+
+    Text:
+    "{text}"
+
+    Language code:
+    """)
+register_prompt("detect", "v2", """
+    Reply with only the ISO 639-1 code of this text's language.
+
+    {text}
+    """)
+
+register_prompt("translate", "v1", """
+    Task: Translate the following text from {source_language} to {target_language} with extreme precision and accuracy.
+
+    Instructions:
+    1. Analyze the text thoroughly to understand its full context, tone, and intent.
+    2. Consider any cultural nuances, idioms, or specific terminology in the source text.
+    3. Translate the text maintaining the original meaning, tone, and style as closely as possible.
+    4. Ensure proper grammar, punctuation, and formatting in the target language.
+    5. If there are multiple possible interpretations, choose the most appropriate one based on context.
+    6. For any ambiguous terms or phrases, provide the most likely translation and include a brief explanation in parentheses if necessary.
+    7. Double-check the translation for accuracy, paying special attention to:
+       - Correct use of tenses
+       - Proper noun translations (names, places, etc.)
+       - Numerical values and units of measurement
+       - Technical or specialized vocabulary
+    8. Verify that no part of the original text has been omitted in the translation.
+    9. Ensure that the translation reads naturally in the target language.
+    10. If the text contains humor, wordplay, or cultural references, adapt them appropriately for the target language and culture.
+
+    Original text:
+    "{text}"
+
+    Translated text (in {target_language}):
+    """)
+register_prompt("translate", "v2", """
+    Translate from {source_language} to {target_language}. Keep meaning, tone, formatting, names and numbers; adapt idioms naturally. Reply with the translation only.
+
+    {text}
+    """)
+
+register_prompt("translate_multi", "v1", """
+    Translate from {source_language} into each of: {target_languages}. Keep meaning, tone, formatting, names and numbers; adapt idioms naturally. Reply with only a JSON object mapping each language code to its translation.
+
+    {text}
+    """)
+
+register_prompt("translate_batch", "v1", """
+    Translate each string of this JSON array from {source_language} to {target_language}. Keep meaning, tone, formatting, names and numbers; adapt idioms naturally. Reply with only a JSON array of the translations, same length and order.
+
+    {texts}
+    """)
+
+register_prompt("verify", "v1", """
+    Verify the accuracy of the following translation from {source_language} to {target_language}:
+
+    Original: "{text}"
+    Translation: "{translation}"
+
+    Instructions:
+    1. Check for any mistranslations or inaccuracies.
+    2. Verify that the tone and style are preserved.
+    3. Ensure all content from the original is included in the translation.
+    4. Check for proper grammar and natural flow in the target language.
+
+    If any issues are found, provide a corrected version. If no issues are found, respond with "Translation is accurate."
+
+    Verification result:
+    """)
+register_prompt("verify", "v2", """
+    Check this {source_language}->{target_language} translation for errors or omissions. Reply OK if it is correct, otherwise only the corrected translation.
+
+    Original:
+    {text}
+
+    Translation:
+    {translation}
+    """)
+
+register_prompt("verify", "v3", """
+    Check this {source_language}->{target_language} translation for errors or omissions. Reply with only JSON: {{"ok": true}} if it is correct, otherwise {{"correction": "<corrected translation>"}}.
+
+    Original:
+    {text}
+
+    Translation:
+    {translation}
+    """)
+
+register_prompt("tts", "v1", """
+    Task: Improve the text for text to speech.
+
+    Instructions:
+    1. Analyze the text thoroughly to understand its full context, tone, and intent.
+    2. Correct any grammar issues to make the text perfect for a text to speech application.
+    3. If the text contains humor, wordplay, or cultural references make sure that these are also present when reading it out loud.
+    4. Remove all Anführungszeichen und sonderzeichen wie ! " # $ % & / ( ) = ? ~ etc. die eine korrekte Text zu Sprache ausgabe behindern.
+
+    Text:
+    "{text}"
+
+    Improved Text:
+    """)
+register_prompt("tts", "v2", """
+    Rewrite for text-to-speech: fix grammar, keep language and meaning, no quotes or special characters. Reply with the text only.
+
+    {text}
+    """)
+
+register_prompt("chat", "v1", "{message}")
+
+# Anfänge von Freitext-Antworten (v1, v2), mit denen die Verifikation eine Übersetzung bestätigt
+VERIFY_OK_PREFIXES = ("ok", "translation is accurate")
+
+def parse_verify_reply(reply: str) -> str | None:
+    """
+    Interprets the reply of the verification prompt.
+
+    v3 replies are JSON; only an explicit, non-empty "correction" replaces the translation. Free-text
+    replies (v1, v2) are normalized, and anything starting with an OK phrase counts as confirmation.
+
+    Args:
+        reply: The model's reply.
+
+    Returns:
+        The corrected translation, or None if the translation was confirmed.
+    """
+    text = reply.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            verdict = json.loads(text[start:end + 1])
+        except ValueError:
+            verdict = None
+        if isinstance(verdict, dict):
+            correction = verdict.get("correction")
+            return correction.strip() if isinstance(correction, str) and correction.strip() else None
+    normalized = text.casefold().rstrip(" .!")
+    if not normalized or normalized.startswith(VERIFY_OK_PREFIXES):
+        return None
+    return text
+
+# --- Token Accounting ---
+
+_token_usage = {}  # type: dict[str, dict[str, float]]
+_usage_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count locally without an API call.
+
+    Roughly four ASCII characters per token; other scripts (CJK, Thai, ...) count about one token per character.
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return max(1, round(ascii_chars / 4 + (len(text) - ascii_chars)))
+
+def count_tokens(text: str, model=None) -> int:
+    """
+    Counts the tokens of a text, locally or through the API depending on PROMPT_TOKEN_COUNTING.
+
+    Args:
+        text: The text to count.
+        model: The Gemini model (optional), required for API counting.
+
+    Returns:
+        The token count.
+    """
+    if PROMPT_TOKEN_COUNTING == 'api' and model is not None:
+        try:
+            return model.count_tokens(text).total_tokens
+        except Exception as e:
+            logger.warning(f"Token count via API failed, using local estimate: {e}")
+    return estimate_tokens(text)
+
+def record_usage(prompt_key: str, input_tokens: int, output_tokens: int, latency: float) -> None:
+    """Adds one call to the per-template token totals."""
+    with _usage_lock:
+        usage = _token_usage.setdefault(prompt_key, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "latency": 0.0})
+        usage["calls"] += 1
+        usage["input_tokens"] += input_tokens
+        usage["output_tokens"] += output_tokens
+        usage["latency"] += latency
+
+def get_token_usage() -> dict[str, dict[str, float]]:
+    """Returns a copy of the per-template token totals."""
+    with _usage_lock:
+        return {key: dict(usage) for key, usage in _token_usage.items()}
+
+def token_report() -> str:
+    """
+    Formats the per-template token totals.
+
+    Returns:
+        A human-readable report.
+    """
+    usage = get_token_usage()
+    if not usage:
+        return "🧮 No prompt calls recorded yet."
+    lines = ["🧮 Token usage per template:\n"]
+    for key, stats in sorted(usage.items()):
+        calls = stats["calls"]
+        lines.append(f"{key}: {calls} calls, {stats['input_tokens']} in / {stats['output_tokens']} out "
+                     f"(avg {stats['input_tokens'] / calls:.0f} in, {stats['latency'] / calls:.2f}s)")
+    total_in = sum(stats["input_tokens"] for stats in usage.values())
+    total_out = sum(stats["output_tokens"] for stats in usage.values())
+    lines.append(f"\nTotal: {total_in} input / {total_out} output tokens")
+    return "\n".join(lines)
+
+def generate(model, task: str, version: str = None, **fields) -> str:
+    """
+    Renders a prompt, sends it to the model and records the token usage.
+
+    Args:
+        model: The Gemini model.
+        task: The task name.
+        version: The template version (optional).
+        **fields: The template fields.
+
+    Returns:
+        The stripped response text.
+    """
+    prompt = get_prompt(task, version)
+    prompt_text = prompt.render(**fields)
+
+    start = time.perf_counter()
+    response = model.generate_content(prompt_text)
+    latency = time.perf_counter() - start
+    response_text = response.text.strip()
+
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None and getattr(metadata, "prompt_token_count", None):
+        input_tokens = metadata.prompt_token_count
+        output_tokens = metadata.candidates_token_count or 0
+    else:
+        input_tokens = count_tokens(prompt_text, model)
+        output_tokens = estimate_tokens(response_text)
+    record_usage(prompt.key, input_tokens, output_tokens, latency)
+    return response_text
+
+# --- Benchmark ---
+
+BENCHMARK_CORPUS = [
+    ("en", "de", "See you tomorrow at 10am at the main station!"),
+    ("de", "en", "Die Sitzung wurde auf nächsten Dienstag verschoben, bitte bringt eure Unterlagen mit."),
+    ("es", "en", "No hay mal que por bien no venga."),
+    ("en", "ja", "Our quarterly revenue grew 12.5% to $4.2M, driven mainly by the EU market."),
+    ("ru", "en", "Привет! Как дела? Давно не виделись."),
+    ("en", "fr", "Breaking: the launch has been delayed by 48 hours due to high winds over the Atlantic. "
+                 "Crews will reassess the weather on Friday morning and announce a new window."),
+]
+
+def _benchmark_fields(task: str, source: str, target: str, text: str) -> dict:
+    if task == "verify":
+        return {"source_language": source, "target_language": target, "text": text, "translation": text}
+    if task == "chat":
+        return {"message": text}
+    if task == "translate_multi":
+        return {"source_language": source, "target_languages": f"{target}, en, es", "text": text}
+    if task == "translate_batch":
+        return {"source_language": source, "target_language": target,
+                "texts": json.dumps([text, text], ensure_ascii=False)}
+    return {"source_language": source, "target_language": target, "text": text}
+
+def run_benchmark(live: bool = False) -> str:
+    """
+    Compares all template versions on the fixed corpus.
+
+    Args:
+        live: If True, every prompt is sent to Gemini to measure latency and exact token counts.
+
+    Returns:
+        The benchmark report.
+    """
+    model = None
+    if live:
+        from translation_service import get_model
+        model = get_model()
+
+    lines = [f"{'template':<14} {'in tokens':>10} {'out tokens':>11} {'latency':>9}"]
+    for prompt in list_prompts():
+        input_tokens = output_tokens = 0
+        latency = 0.0
+        for source, target, text in BENCHMARK_CORPUS:
+            prompt_text = prompt.render(**_benchmark_fields(prompt.task, source, target, text))
+            if model is None:
+                input_tokens += estimate_tokens(prompt_text)
+                continue
+            start = time.perf_counter()
+            response = model.generate_content(prompt_text)
+            latency += time.perf_counter() - start
+            input_tokens += response.usage_metadata.prompt_token_count
+            output_tokens += response.usage_metadata.candidates_token_count or 0
+        latency_text = f"{latency / len(BENCHMARK_CORPUS):.2f}s" if model else "-"
+        output_text = str(output_tokens) if model else "-"
+        lines.append(f"{prompt.key:<14} {input_tokens:>10} {output_text:>11} {latency_text:>9}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    # python prompts.py          -> lokale Token-Schätzung für alle Varianten
+    # python prompts.py --live   -> zusätzlich Latenz und exakte Tokens über die Gemini-API
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    print(run_benchmark(live='--live' in sys.argv))
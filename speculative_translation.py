@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from durable_queue import PRIORITY_LOW
+from jobs import submit_job, register_job_handler
+from translation_service import translate_multi, get_cached_translation, add_cache_hit_listener
+from user_management import get_top_languages
+from usage_stats import forward_latency_report
+from constants import SPECULATIVE_TOP_K, SPECULATIVE_HOURLY_QUOTA, SPECULATIVE_MAX_CHARS, SPECULATIVE_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Kanal-Posts werden oft von vielen Nutzern weitergeleitet. Beim ersten Auftreten übersetzen wir sie
+# im Hintergrund (niedrige Priorität) in die häufigsten Nutzersprachen, damit spätere Weiterleitungen
+# direkt aus dem Cache bedient werden.
+
+speculative_stats = {"queued": 0, "skipped_quota": 0, "produced": 0, "used": 0}
+
+_seen_posts = OrderedDict()  # (channel_id, message_id) -> None, begrenzt auf _MAX_SEEN_POSTS
+_MAX_SEEN_POSTS = 10000
+_queued_times = deque()  # Zeitpunkte der spekulativen Jobs der letzten Stunde
+_unused_keys = OrderedDict()  # Spekulativ erzeugte Cache-Schlüssel, die noch nicht abgerufen wurden
+_MAX_UNUSED_KEYS = 20000  # Ältere Einträge werden vergessen und bleiben als ungenutzt gezählt
+
+def _on_cache_hit(cache_key: tuple) -> None:
+    if cache_key in _unused_keys:
+        del _unused_keys[cache_key]
+        speculative_stats["used"] += 1
+
+add_cache_hit_listener(_on_cache_hit)
+
+def _quota_available() -> bool:
+    now = time.monotonic()
+    while _queued_times and now - _queued_times[0] > 3600:
+        _queued_times.popleft()
+    return len(_queued_times) < SPECULATIVE_HOURLY_QUOTA
+
+def maybe_pretranslate(text: str, channel_id: int, message_id: int, exclude_language: str = None) -> bool:
+    """
+    Queues a low-priority pre-translation of a channel post the first time it is seen.
+
+    Args:
+        text: The text of the post.
+        channel_id: The ID of the channel.
+        message_id: The ID of the post in the channel.
+        exclude_language: A language that is being translated anyway (optional).
+
+    Returns:
+        True if a pre-translation job was queued.
+    """
+    if not text or len(text) > SPECULATIVE_MAX_CHARS:
+        return False
+    post = (channel_id, message_id)
+    if post in _seen_posts:
+        return False
+    _seen_posts[post] = None
+    if len(_seen_posts) > _MAX_SEEN_POSTS:
+        _seen_posts.popitem(last=False)
+
+    languages = [language for language in get_top_languages(SPECULATIVE_TOP_K + 1)
+                 if language != exclude_language and get_cached_translation(text, language) is None][:SPECULATIVE_TOP_K]
+    if not languages:
+        return False
+    if not _quota_available():
+        speculative_stats["skipped_quota"] += 1
+        return False
+
+    if submit_job("pretranslate", {"text": text, "target_languages": languages},
+                  job_id=f"pretranslate:{channel_id}:{message_id}", priority=PRIORITY_LOW):
+        _queued_times.append(time.monotonic())
+        speculative_stats["queued"] += 1
+        return True
+    return False
+
+async def pretranslate_job(payload: dict) -> None:
+    """Job handler: translates a post into all queued languages with a single call."""
+    text = payload["text"]
+    languages = [language for language in payload["target_languages"] if get_cached_translation(text, language) is None]
+    if not languages:
+        return
+    await asyncio.to_thread(translate_multi, text, languages)
+    for language in languages:
+        _unused_keys[(text, None, language)] = None
+    while len(_unused_keys) > _MAX_UNUSED_KEYS:
+        _unused_keys.popitem(last=False)
+    speculative_stats["produced"] += len(languages)
+
+# PRIORITY_LOW bestimmt nur die Reihenfolge; das Limit verhindert, dass Vorab-Übersetzungen alle Worker belegen
+register_job_handler("pretranslate", pretranslate_job, max_concurrency=SPECULATIVE_MAX_WORKERS)
+
+async def channel_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles new posts in channels the bot was added to."""
+    post = update.channel_post
+    text = post.text or post.caption
+    if text:
+        maybe_pretranslate(text, post.chat_id, post.message_id)
+
+def speculative_report() -> str:
+    """
+    Formats the speculative pre-translation statistics.
+
+    Returns:
+        A human-readable report.
+    """
+    stats = speculative_stats
+    produced = stats["produced"]
+    hit_rate = f"{stats['used'] / produced:.0%}" if produced else "-"
+    return (f"🔮 Speculative pre-translations\n"
+            f"Jobs queued: {stats['queued']} (skipped by quota: {stats['skipped_quota']})\n"
+            f"Translations produced: {produced}\n"
+            f"Used by later requests: {stats['used']} ({hit_rate})\n"
+            f"Not used yet / wasted: {produced - stats['used']}\n\n"
+            f"{forward_latency_report()}")
@@ -0,0 +1,103 @@
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Misst Import- und Initialisierungszeiten beim Start (python translator_bot.py --profile-startup).
+# Ohne install() bleibt builtins.__import__ unverändert, es entsteht also kein Overhead.
+
+_original_import = None
+_start_time = None
+_ready_time = None  # Zeitpunkt, ab dem der Bot Updates verarbeiten könnte
+_import_times = {}  # module name -> (cumulative seconds, self seconds, finished at)
+_import_stack = []  # Zeit, die verschachtelte Imports der jeweiligen Ebene verbraucht haben
+_phases = []  # (phase name, seconds)
+
+def install() -> None:
+    """
+    Starts recording import times. Must run before the modules to be measured are imported.
+    """
+    global _original_import, _start_time
+    if _original_import is not None:
+        return
+    _start_time = time.perf_counter()
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+def uninstall() -> None:
+    """Restores the original import function."""
+    global _original_import
+    if _original_import is not None:
+        builtins.__import__ = _original_import
+        _original_import = None
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)  # Bereits geladen, praktisch kostenlos
+
+    start = time.perf_counter()
+    _import_stack.append(0.0)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _import_stack.pop()
+        if _import_stack:
+            _import_stack[-1] += elapsed
+        _import_times.setdefault(name, (elapsed, elapsed - children, start + elapsed))
+
+@contextmanager
+def phase(name: str):
+    """
+    Records the duration of an initialization phase.
+
+    Args:
+        name: The name shown in the report.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+def mark_ready() -> None:
+    """Marks the end of the critical startup path; later phases are reported but not counted."""
+    global _ready_time
+    _ready_time = time.perf_counter()
+
+def report(target_seconds: float, limit: int = 20) -> tuple[str, bool]:
+    """
+    Builds the startup report.
+
+    Args:
+        target_seconds: The cold start target.
+        limit: The number of slowest imports to list.
+
+    Returns:
+        A tuple of (report text, True if the startup stayed within the target).
+    """
+    end_time = _ready_time if _ready_time is not None else time.perf_counter()
+    total = end_time - _start_time if _start_time is not None else 0.0
+    bot_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def _format(items):
+        for name, (cumulative, own, finished_at) in items:
+            deferred = " (deferred)" if _ready_time is not None and finished_at > _ready_time else ""
+            yield f"{cumulative * 1000:9.1f}ms {own * 1000:7.1f}ms  {name}{deferred}"
+
+    bot_modules = [item for item in _import_times.items()
+                   if os.path.dirname(os.path.abspath(getattr(sys.modules.get(item[0]), '__file__', None) or '')) == bot_dir]
+    lines = ["Startup profile", "", "Bot modules:", f"{'cumulative':>11} {'self':>9}  module"]
+    lines += _format(sorted(bot_modules, key=lambda item: item[1][0], reverse=True))
+
+    lines += ["", "Slowest imports:", f"{'cumulative':>11} {'self':>9}  module"]
+    lines += _format(sorted(_import_times.items(), key=lambda item: item[1][0], reverse=True)[:limit])
+
+    lines += ["", f"{'duration':>11}  init phase"]
+    for name, seconds in _phases:
+        lines.append(f"{seconds * 1000:9.1f}ms  {name}")
+
+    within_target = total <= target_seconds
+    lines += ["", f"Critical path: {total:.3f}s (target {target_seconds:.3f}s) - {'OK' if within_target else 'OVER TARGET'}"]
+    return "\n".join(lines), within_target
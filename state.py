@@ -0,0 +1,34 @@
+from utils import load_json, save_json
+from constants import USER_SETTINGS_FILE, USAGE_STATS_FILE, USER_INFO_FILE, VIP_USERS_FILE, GROUP_SETTINGS_FILE
+
+# Gemeinsamer Zustand: Jede Datei wird genau einmal geladen und von allen Modulen geteilt.
+# Die Objekte dürfen nur in-place verändert werden (clear(), add(), ...), nie neu zugewiesen.
+user_settings = load_json(USER_SETTINGS_FILE)
+usage_stats = load_json(USAGE_STATS_FILE, {"total_translations": 0, "daily_stats": {}})
+vip_users = set(load_json(VIP_USERS_FILE, []))
+group_settings = load_json(GROUP_SETTINGS_FILE)  # chat_id -> {"enabled": bool, "members": [user_id, ...]}
+
+_user_info = None  # Vollständige Profile (kalter Speicher), werden erst beim ersten Zugriff geladen
+
+def get_user_info() -> dict:
+    """
+    Returns the full user profiles, loading user_info.json on first access.
+
+    The per-message hot path only uses the compact user index (see user_management), so the
+    profiles are usually only loaded for admin views and periodic flushes.
+    """
+    global _user_info
+    if _user_info is None:
+        _user_info = load_json(USER_INFO_FILE)
+    return _user_info
+
+def flush_state() -> None:
+    """
+    Writes all shared state back to disk.
+    """
+    save_json(USER_SETTINGS_FILE, user_settings)
+    save_json(USAGE_STATS_FILE, usage_stats)
+    if _user_info is not None:
+        save_json(USER_INFO_FILE, _user_info)
+    save_json(VIP_USERS_FILE, list(vip_users))
+    save_json(GROUP_SETTINGS_FILE, group_settings)
@@ -1,11 +1,13 @@
-import google.generativeai as genai
+import bisect
+import json
 import logging
 import threading
 
-from gtts import gTTS
 import os
+import tempfile
 
 from constants import VALID_LANGUAGE_CODES
+from prompts import generate, parse_verify_reply
 
 logger = logging.getLogger(__name__)
 
@@ -20,27 +22,95 @@ MODEL_NAME = 'gemini-pro'  # Using 'gemini-pro' for stability
 _model = None  # Model instance, private
 
 def get_model():
-    """Singleton pattern to get the Gemini model instance."""
+    """Singleton pattern to get the Gemini model instance. The SDK is imported on first use."""
     global _model
     if _model is None:
         try:
+            import google.generativeai as genai  # Schwerer Import (~1 s), erst bei Bedarf laden
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
             _model = genai.GenerativeModel(MODEL_NAME)
         except Exception as e:
             raise TranslationError(f"Failed to initialize the Gemini model: {e}")
     return _model
 
-# Thread-safe cache for translations
-_translation_cache = {}  # type: dict[str, str]
+# Thread-safe cache for translations, keyed by (text, source_language, target_language)
+_translation_cache = {}  # type: dict[tuple[str, str | None, str], str]
+_prefix_index = {}  # type: dict[str, list[str]]  # target_language -> sorted cached texts, for prefix lookups
 _cache_lock = threading.Lock()
+_cache_hit_listeners = []  # Callbacks, die bei jedem Cache-Treffer den Schlüssel erhalten
 
-def translate_text(text: str, target_language: str, source_language: str = None) -> str:
+def add_cache_hit_listener(listener) -> None:
+    """
+    Registers a callback that is called with the cache key whenever a translation is served from the cache.
+
+    Args:
+        listener: A function taking the (text, source_language, target_language) key.
+    """
+    _cache_hit_listeners.append(listener)
+
+def _notify_cache_hit(cache_key: tuple) -> None:
+    for listener in _cache_hit_listeners:
+        try:
+            listener(cache_key)
+        except Exception as e:
+            logger.error(f"Cache hit listener failed: {e}")
+
+def _store_translation(cache_key: tuple, translated_text: str) -> None:
+    """Stores a translation in the cache and the prefix index. Caller must hold _cache_lock."""
+    texts = _prefix_index.setdefault(cache_key[2], [])
+    position = bisect.bisect_left(texts, cache_key[0])
+    if position == len(texts) or texts[position] != cache_key[0]:
+        texts.insert(position, cache_key[0])
+    _translation_cache[cache_key] = translated_text
+
+def get_cached_translation(text: str, target_language: str, source_language: str = None) -> str | None:
+    """
+    Gets a translation from the cache without calling the API.
+
+    Args:
+        text: The original text.
+        target_language: The target language code.
+        source_language: The source language code (optional).
+
+    Returns:
+        The cached translation, or None if it is not cached.
+    """
+    with _cache_lock:
+        return _translation_cache.get((text, source_language, target_language))
+
+def find_cached_translations(prefix: str, target_language: str, limit: int = 3) -> list[tuple[str, str]]:
+    """
+    Finds cached translations whose original text starts with the given prefix.
+
+    Args:
+        prefix: The beginning of the original text.
+        target_language: The target language code.
+        limit: The maximum number of matches.
+
+    Returns:
+        A list of (original text, translation) tuples.
+    """
+    matches = []
+    with _cache_lock:
+        texts = _prefix_index.get(target_language, [])
+        position = bisect.bisect_left(texts, prefix)
+        while position < len(texts) and len(matches) < limit and texts[position].startswith(prefix):
+            text = texts[position]
+            position += 1
+            if (text, None, target_language) in _translation_cache:
+                matches.append((text, _translation_cache[(text, None, target_language)]))
+    return matches
+
+def translate_text(text: str, target_language: str, source_language: str = None, store: bool = True) -> str:
     """
     Translates text from a source language to a target language using the Gemini API.
 
     Args:
         text: The text to translate.
         target_language: The target language code (e.g., 'en', 'de').
-        source_language: The source language code (optional). If None, the API will attempt to detect it.
+        source_language: The source language code (optional). If None, the model infers it from the text.
+        store: Whether to add the translation to the cache. Document segments are not stored,
+            so that large files do not flood the cache.
 
     Returns:
         The translated text.
@@ -56,94 +126,163 @@ def translate_text(text: str, target_language: str, source_language: str = None)
         raise TranslationError(f"Invalid target language: {target_language}")
 
     # 2. Check the cache
-    cache_key = f"{text}_{source_language}_{target_language}"
+    cache_key = (text, source_language, target_language)
     with _cache_lock:
-        if cache_key in _translation_cache:
-            logger.debug("Translation from cache.") #Added Debug
-            return _translation_cache[cache_key]
+        cached_text = _translation_cache.get(cache_key)
+    if cached_text is not None:
+        logger.debug("Translation from cache.") #Added Debug
+        _notify_cache_hit(cache_key)
+        return cached_text
 
     try:
         model = get_model()
 
-        if not source_language:
-            prompt_detect = f"""
-            Task: Detect the language of the following text.
+        # Keine separate Spracherkennung: der Übersetzungs-Prompt kommt ohne Quellsprache aus
+        if source_language not in VALID_LANGUAGE_CODES:
+            source_language = "the source language"  # Fallback
 
-            Instructions:
-            1. Analyze the text thoroughly to identify the language used.
-            2. Respond with the language code of the detected language.
+        translated_text = generate(model, "translate", text=text,
+                                   source_language=source_language, target_language=target_language)
 
-            Text:
-            "{text}"
+        # Verification Step
+        verification_result = generate(model, "verify", text=text, translation=translated_text,
+                                       source_language=source_language, target_language=target_language)
+        correction = parse_verify_reply(verification_result)
+        if correction is not None:
+            translated_text = correction
 
-            Language code:
-            """
-            response_detect = model.generate_content(prompt_detect)
-            source_language = response_detect.text.strip()
+        # 3. Store in the cache
+        if store:
+            with _cache_lock:
+                _store_translation(cache_key, translated_text)
+        return translated_text
 
-        if source_language not in VALID_LANGUAGE_CODES:
-            source_language = "the source language"  # Fallback
+    except Exception as e:
+        logger.exception(f"Translation failed for text '{text}': {e}")  # Log the original text and the error
+        raise TranslationError(f"Translation failed: {e}")  # Re-raise as TranslationError
 
-        prompt = f"""
-        Task: Translate the following text from {source_language} to {target_language} with extreme precision and accuracy.
-
-        Instructions:
-        1. Analyze the text thoroughly to understand its full context, tone, and intent.
-        2. Consider any cultural nuances, idioms, or specific terminology in the source text.
-        3. Translate the text maintaining the original meaning, tone, and style as closely as possible.
-        4. Ensure proper grammar, punctuation, and formatting in the target language.
-        5. If there are multiple possible interpretations, choose the most appropriate one based on context.
-        6. For any ambiguous terms or phrases, provide the most likely translation and include a brief explanation in parentheses if necessary.
-        7. Double-check the translation for accuracy, paying special attention to:
-           - Correct use of tenses
-           - Proper noun translations (names, places, etc.)
-           - Numerical values and units of measurement
-           - Technical or specialized vocabulary
-        8. Verify that no part of the original text has been omitted in the translation.
-        9. Ensure that the translation reads naturally in the target language.
-        10. If the text contains humor, wordplay, or cultural references, adapt them appropriately for the target language and culture.
-
-        Original text:
-        "{text}"
-
-        Translated text (in {target_language}):
-        """
-
-        response = model.generate_content(prompt)
-        translated_text = response.text.strip()
+def _parse_multi_response(response_text: str) -> dict:
+    """Extracts the JSON object from a multi-target response, tolerating Markdown code fences."""
+    start = response_text.find("{")
+    end = response_text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("Response contains no JSON object")
+    result = json.loads(response_text[start:end + 1])
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    return result
+
+def translate_multi(text: str, target_languages: list[str], source_language: str = None) -> dict[str, str]:
+    """
+    Translates text into several target languages with a single Gemini call.
 
-        # Verification Step
-        verification_prompt = f"""
-        Verify the accuracy of the following translation from {source_language} to {target_language}:
+    Cached targets are served from the translation cache; all others are requested together in one
+    structured (JSON) response and stored in the cache under each target. Unlike translate_text,
+    there is no separate verification call.
 
-        Original: "{text}"
-        Translation: "{translated_text}"
+    Args:
+        text: The text to translate.
+        target_languages: The target language codes (e.g., ['en', 'de']).
+        source_language: The source language code (optional).
 
-        Instructions:
-        1. Check for any mistranslations or inaccuracies.
-        2. Verify that the tone and style are preserved.
-        3. Ensure all content from the original is included in the translation.
-        4. Check for proper grammar and natural flow in the target language.
+    Returns:
+        A dict mapping each target language code to its translation.
 
-        If any issues are found, provide a corrected version. If no issues are found, respond with "Translation is accurate."
+    Raises:
+        TranslationError: If the translation fails.
+    """
+    if not text:
+        return {language: "" for language in target_languages}
 
-        Verification result:
-        """
+    invalid = [language for language in target_languages if language not in VALID_LANGUAGE_CODES]
+    if invalid:
+        raise TranslationError(f"Invalid target language: {', '.join(invalid)}")
 
-        verification_response = model.generate_content(verification_prompt)
-        verification_result = verification_response.text.strip()
+    translations = {}
+    missing = []
+    with _cache_lock:
+        for language in dict.fromkeys(target_languages):
+            cache_key = (text, source_language, language)
+            if cache_key in _translation_cache:
+                translations[language] = _translation_cache[cache_key]
+            else:
+                missing.append(language)
+    for language in translations:
+        _notify_cache_hit((text, source_language, language))
+    if not missing:
+        return translations
+    if len(missing) == 1:
+        translations[missing[0]] = translate_text(text, missing[0], source_language)
+        return translations
 
-        if verification_result != "Translation is accurate.":
-             translated_text = verification_result.split("\n")[-1]  # Get the last line of the response
+    try:
+        prompt_source = source_language if source_language in VALID_LANGUAGE_CODES else "the source language"
+        response_text = generate(get_model(), "translate_multi", text=text, source_language=prompt_source,
+                                 target_languages=", ".join(missing))
+        result = _parse_multi_response(response_text)
+    except Exception as e:
+        logger.exception(f"Multi-target translation failed for text '{text}': {e}")
+        raise TranslationError(f"Translation failed: {e}")
+
+    for language in missing:
+        translated_text = result.get(language)
+        if not isinstance(translated_text, str) or not translated_text.strip():
+            # Sprache fehlt in der Antwort: einzeln nachübersetzen
+            translated_text = translate_text(text, language, source_language)
+        else:
+            translated_text = translated_text.strip()
+            with _cache_lock:
+                _store_translation((text, source_language, language), translated_text)
+        translations[language] = translated_text
+    return translations
+
+def _parse_batch_response(response_text: str, count: int) -> list[str]:
+    """Extracts the JSON array of a batch response, tolerating Markdown code fences."""
+    start = response_text.find("[")
+    end = response_text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("Response contains no JSON array")
+    result = json.loads(response_text[start:end + 1])
+    if not isinstance(result, list) or len(result) != count or not all(isinstance(item, str) for item in result):
+        raise ValueError("Response is not an array of the expected length")
+    return result
+
+def translate_batch(texts: list[str], target_language: str, source_language: str = None) -> list[str]:
+    """
+    Translates several short texts with a single Gemini call. Used for document segments.
 
-        # 3. Store in the cache
-        with _cache_lock:
-            _translation_cache[cache_key] = translated_text
-        return translated_text
+    The texts are sent as a JSON array and the translations are expected as an array of the same
+    length. Like translate_multi, there is no separate verification call; results are not cached.
+    If the response cannot be parsed, the texts are translated one by one with translate_text.
 
+    Args:
+        texts: The texts to translate.
+        target_language: The target language code (e.g., 'en', 'de').
+        source_language: The source language code (optional).
+
+    Returns:
+        The translations, in the order of `texts`.
+
+    Raises:
+        TranslationError: If the translation fails.
+    """
+    if len(texts) <= 1:
+        return [translate_text(text, target_language, source_language, store=False) for text in texts]
+    if target_language not in VALID_LANGUAGE_CODES:
+        raise TranslationError(f"Invalid target language: {target_language}")
+
+    try:
+        prompt_source = source_language if source_language in VALID_LANGUAGE_CODES else "the source language"
+        response_text = generate(get_model(), "translate_batch", texts=json.dumps(texts, ensure_ascii=False),
+                                 source_language=prompt_source, target_language=target_language)
+        return [translation.strip() for translation in _parse_batch_response(response_text, len(texts))]
+    except ValueError as e:
+        # Unbrauchbare Antwort: einzeln nachübersetzen
+        logger.warning(f"Batch translation of {len(texts)} texts returned an invalid response ({e}), translating one by one.")
     except Exception as e:
-        logger.exception(f"Translation failed for text '{text}': {e}")  # Log the original text and the error
-        raise TranslationError(f"Translation failed: {e}")  # Re-raise as TranslationError
+        logger.exception(f"Batch translation of {len(texts)} texts failed: {e}")
+        raise TranslationError(f"Translation failed: {e}")
+    return [translate_text(text, target_language, source_language, store=False) for text in texts]
 
 def text_to_speech(text: str, lang: str) -> str | None:
     """
@@ -159,29 +298,16 @@ def text_to_speech(text: str, lang: str) -> str | None:
     try:
         model = get_model()
 
-        prompt_improve = f"""
-        Task: Improve the text for text to speech.
-
-        Instructions:
-        1. Analyze the text thoroughly to understand its full context, tone, and intent.
-        2. Correct any grammar issues to make the text perfect for a text to speech application.
-        3. If the text contains humor, wordplay, or cultural references make sure that these are also present when reading it out loud.
-        4. Remove all Anführungszeichen und sonderzeichen wie ! " # $ % & / ( ) = ? ~ etc. die eine korrekte Text zu Sprache ausgabe behindern.
-
-        Text:
-        "{text}"
-
-        Improved Text:
-        """
-        response_improve = model.generate_content(prompt_improve)
-        improved_text = response_improve.text.strip()
+        improved_text = generate(model, "tts", text=text)
 
         characters_to_remove = ['"', "'", '!', '#', '$', '%', '&', '/', '(', ')', '=', '?', '~', '<', '>', ',', '.']
         for char in characters_to_remove:
             improved_text = improved_text.replace(char, '')
 
+        from gtts import gTTS  # Erst bei Bedarf laden
         tts = gTTS(text=improved_text, lang=lang)
-        temp_file = "temp.mp3"
+        fd, temp_file = tempfile.mkstemp(suffix=".mp3")  # Eindeutiger Name, TTS-Jobs laufen parallel
+        os.close(fd)
         tts.save(temp_file)
         return temp_file
     except Exception as e:
@@ -1,13 +1,22 @@
+import sys
+
+# Muss vor allen anderen Imports laufen, damit deren Ladezeit gemessen wird
+if '--profile-startup' in sys.argv:
+    import startup_profile
+    startup_profile.install()
+
+import asyncio
 import os
 import logging
-import threading
+import time
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
     ConversationHandler,
     filters,
     ContextTypes
@@ -15,14 +24,24 @@ from telegram.ext import (
 
 from dotenv import load_dotenv
 
-from utils import load_json, save_json
-from translation_service import translate_text, text_to_speech, TranslationError, get_model # Import get_model
-from user_management import ensure_user_in_settings, get_user_language, set_user_language, update_user_info, is_vip
-from usage_stats import update_usage_stats
-from admin_commands import admin_panel, button_callback, handle_admin_input
+from translation_service import translate_text, TranslationError, get_model # Import get_model
+from user_management import (
+    ensure_user_in_settings, get_user_language, update_user_info, is_vip, flush_user_activity
+)
+from admin_commands import admin_panel, button_callback, handle_admin_input, profile_command
 from chat_commands import chat, handle_chat_message, cancel
-from constants import VALID_LANGUAGE_CODES, USER_SETTINGS_FILE, USAGE_STATS_FILE, USER_INFO_FILE, VIP_USERS_FILE, ADMIN_USER_IDS
+from constants import (
+    VALID_LANGUAGE_CODES, ADMIN_USER_IDS, STARTUP_TARGET_SECONDS, SHUTDOWN_DEADLINE_SECONDS, USER_FLUSH_INTERVAL,
+    DOCUMENT_EXTENSIONS
+)
+from state import flush_state  # Gemeinsamer Zustand, nur einmal geladen
 from api_checker import API_Checker
+from jobs import submit_job, start_jobs, stop_jobs
+from inline_translation import inline_query
+from speculative_translation import maybe_pretranslate, channel_post
+from group_translation import autotranslate_command, group_message
+from voice_translation import shutdown_voice_pool
+from document_translation import check_document, DocumentTranslationError
 
 # Lade Umgebungsvariablen aus .env-Datei
 load_dotenv()
@@ -38,16 +57,8 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 ADMIN_USER_IDS = [int(id) for id in os.getenv('ADMIN_USER_IDS').split(',')]
 
-# Daten laden
-user_settings = load_json(USER_SETTINGS_FILE)
-usage_stats = load_json(USAGE_STATS_FILE, {"total_translations": 0, "daily_stats": {}})
-user_info = load_json(USER_INFO_FILE)
-vip_users = set(load_json(VIP_USERS_FILE, []))
-
+# Health-Check läuft im Hintergrund und wird erst nach dem Start des Pollings gestartet
 api_checker = API_Checker(GEMINI_API_KEY)
-# Initialize the model here, after translation_service is imported
-model = get_model()
-api_checker.start()  # Startet den API-Checker-Thread
 tts_command=None
 
 async def tts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -62,17 +73,13 @@ async def tts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     text = " ".join(context.args)
     target_language = get_user_language(user.id)
-    translated_text = translate_text(text, target_language)
-    audio_file = text_to_speech(translated_text, target_language)
-    if audio_file:
-        try:
-            with open(audio_file, 'rb') as f:
-               await update.message.reply_audio(audio=InputFile(f), title="Text to Speech")
-            os.remove(audio_file)
-        except Exception as e:
-            await update.message.reply_text(f"An error occurred while sending audio: {e}")
-    else:
-        await update.message.reply_text("An error occurred while generating audio.")
+    message = update.message
+    submit_job("tts", {
+        "chat_id": message.chat_id,
+        "message_id": message.message_id,
+        "text": text,
+        "target_language": target_language,
+    }, job_id=f"tts:{message.chat_id}:{message.message_id}")
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
@@ -100,8 +107,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                       "🌍 /languagecodes - View available language codes\n" \
                       "👨‍💼 /admin - Access admin panel (only for authorized users)\n" \
                       "🎧 /tts [text] - Convert text to speech (VIP only)\n" \
-                      "💬 /chat - Start a chat session (for VIP users and admins)\n\n" \
-                      "To translate, simply forward a message to me. Enjoy translating! 🎉"
+                      "💬 /chat - Start a chat session (for VIP users and admins)\n" \
+                      "🌐 /autotranslate on|off - Auto-translate a group into its members' languages (group admins)\n\n" \
+                      "To translate, simply forward a message to me, send me a .txt, .srt or .md file, or type @ followed by my username and your text in any chat. Enjoy translating! 🎉"
 
     await update.message.reply_text(help_message_en)
 
@@ -134,9 +142,6 @@ async def translate_forwarded(update: Update, context: ContextTypes.DEFAULT_TYPE
     ensure_user_in_settings(user.id)
     message = update.message
 
-    if message.voice:
-        return  # If voice message, do not translate
-
     if not message.forward_origin:
         await update.message.reply_text("This message is not a forwarded message.")
         return
@@ -154,6 +159,8 @@ async def translate_forwarded(update: Update, context: ContextTypes.DEFAULT_TYPE
             original_sender = f"@{message.forward_origin.sender_user.username}" if message.forward_origin.sender_user.username else message.forward_origin.sender_user.first_name
         elif message.forward_origin.type == "chat":
             original_sender = message.forward_origin.chat.title or "Channel"
+        elif message.forward_origin.type == "channel":
+            original_sender = message.forward_origin.chat.title or "Channel"
         elif message.forward_origin.type == "hidden_user":
             original_sender = message.forward_origin.sender_user_name
         else:
@@ -161,28 +168,57 @@ async def translate_forwarded(update: Update, context: ContextTypes.DEFAULT_TYPE
     except Exception as e:
         logger.error(f"Error determining sender info: {e}")
 
-    try:
-        translated_text = translate_text(text, target_language, source_language)
-
-        if str(user.id) in user_info:
-            if "translation_history" not in user_info[str(user.id)]:
-               user_info[str(user.id)]["translation_history"] = []
-            user_info[str(user.id)]["translation_history"].append({"original_text": text, "translated_text": translated_text})
-            if len(user_info[str(user.id)]["translation_history"]) > 10:
-                user_info[str(user.id)]["translation_history"].pop(0)
-            save_json(USER_INFO_FILE, user_info)
+    # Die eigentliche Arbeit läuft über die persistente Job-Queue (siehe jobs.py) und übersteht Neustarts.
+    # Die Job-ID aus Chat und Nachricht verhindert doppelte Übersetzungen, falls Telegram ein Update erneut sendet.
+    payload = {
+        "received_at": time.time(),
+        "chat_id": message.chat_id,
+        "message_id": message.message_id,
+        "user": user.to_dict(),
+        "target_language": target_language,
+        "source_language": source_language,
+        "original_sender": original_sender,
+    }
+    if message.voice:
+        payload.update(file_id=message.voice.file_id, file_size=message.voice.file_size, duration=message.voice.duration)
+        submit_job("translate_voice", payload, job_id=f"voice:{message.chat_id}:{message.message_id}")
+    else:
+        payload["text"] = text
+        submit_job("translate_forward", payload, job_id=f"translate:{message.chat_id}:{message.message_id}")
+        if message.forward_origin.type == "channel":
+            # Erste Weiterleitung eines Kanal-Posts: weitere Sprachen vorab übersetzen
+            maybe_pretranslate(text, message.forward_origin.chat.id, message.forward_origin.message_id,
+                               exclude_language=target_language)
+
+async def translate_document_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handles .txt, .srt and .md files sent to the bot and queues their translation.
+    """
+    user = update.effective_user
+    ensure_user_in_settings(user.id)
+    message = update.message
+    document = message.document
 
-        response = f"Original sender: {original_sender}\n\n🔤 Translation:\n\n{translated_text}"
-        await update.message.reply_text(response)
-        update_usage_stats()
-        update_user_info(user)
+    try:
+        check_document(document.file_name, document.file_size)
+    except DocumentTranslationError as e:
+        await message.reply_text(f"Error: {e}")
+        return
 
-    except TranslationError as e:
-        logger.error(f"Translation error: {e}")
-        await update.message.reply_text(f"Error: Translation failed. Please try again later. {e}")  #User friendly message
-    except Exception as e:
-        logger.exception(f"Unexpected error in translation: {e}") #Logs full stacktrace
-        await update.message.reply_text("An unexpected error occurred. Please try again later.") #Simple user message
+    # Eine Nachricht für den Fortschritt, die der Job laufend bearbeitet
+    progress_message = await message.reply_text(f"📄 Translating {document.file_name}...")
+    work_id = f"{message.chat_id}_{message.message_id}"
+    submit_job("translate_document", {
+        "chat_id": message.chat_id,
+        "message_id": message.message_id,
+        "progress_message_id": progress_message.message_id,
+        "user": user.to_dict(),
+        "target_language": get_user_language(user.id),
+        "file_id": document.file_id,
+        "file_name": document.file_name,
+        "file_size": document.file_size,
+        "work_id": work_id,
+    }, job_id=f"document:{work_id}")
 
 async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
@@ -195,9 +231,40 @@ async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
     await update.message.reply_text("🌐 Please choose your language:", reply_markup=reply_markup)
 
-def main() -> None:
+_user_flush_task = None
+
+async def _flush_user_activity_periodically() -> None:
+    while True:
+        await asyncio.sleep(USER_FLUSH_INTERVAL)
+        try:
+            flush_user_activity()
+        except Exception as e:
+            logger.error(f"Failed to flush user activity: {e}")
+
+async def post_init(application: Application) -> None:
+    """Starts background services once the bot is up, keeping them off the startup path."""
+    global _user_flush_task
+    start_jobs(application.bot)
+    api_checker.start()  # Startet den API-Checker-Thread
+    _user_flush_task = asyncio.create_task(_flush_user_activity_periodically())
+
+async def post_stop(application: Application) -> None:
+    """Drains running jobs; whatever is unfinished at the deadline is checkpointed for replay."""
+    await stop_jobs(SHUTDOWN_DEADLINE_SECONDS)
+
+async def post_shutdown(application: Application) -> None:
+    """Stops the remaining background services and writes all state to disk."""
+    if _user_flush_task is not None:
+        _user_flush_task.cancel()
+    api_checker.stop(timeout=1)
+    shutdown_voice_pool()
+    flush_user_activity()
+    flush_state()
+
+def build_application() -> Application:
     # Use ApplicationBuilder for a more modern approach
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (Application.builder().token(TELEGRAM_BOT_TOKEN)
+           .post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build())
 
     # Add handlers using the application object
     app.add_handler(CommandHandler("start", start))
@@ -205,12 +272,27 @@ def main() -> None:
     app.add_handler(CommandHandler("languagecodes", language_codes))
     app.add_handler(CommandHandler("setlanguage", set_language))
     app.add_handler(CommandHandler("admin", admin_panel))
+    app.add_handler(CommandHandler("profile", profile_command))
+    document_filter = filters.Document.FileExtension(DOCUMENT_EXTENSIONS[0][1:])
+    for extension in DOCUMENT_EXTENSIONS[1:]:
+        document_filter |= filters.Document.FileExtension(extension[1:])
+    # Vor FORWARDED registriert, damit auch weitergeleitete Dateien übersetzt werden
+    app.add_handler(MessageHandler(filters.ChatType.PRIVATE & document_filter, translate_document_message))
     app.add_handler(MessageHandler(filters.FORWARDED, translate_forwarded))
     app.add_handler(CommandHandler("tts", tts_command))
+    app.add_handler(CommandHandler("autotranslate", autotranslate_command))
     app.add_handler(CallbackQueryHandler(button_callback))
+    app.add_handler(InlineQueryHandler(inline_query))
+    app.add_handler(MessageHandler(filters.UpdateType.CHANNEL_POST & (filters.TEXT | filters.CAPTION), channel_post))
 
     # Define the wrapper function BEFORE it is used in the ConversationHandler
     async def handle_chat_message_wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE): # Wrapper function
+        try:
+            model = get_model()  # Lazy: Modell wird erst beim ersten Chat erstellt
+        except TranslationError as e:
+            logger.error(f"Chat model unavailable: {e}")
+            await update.message.reply_text("The AI is currently unavailable. Please try again later.")
+            return 1
         return await handle_chat_message(update, context, model) # Pass model here
 
 
@@ -225,8 +307,33 @@ def main() -> None:
 
     app.add_handler(chat_handler)
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_admin_input))
+    # Eigene Handler-Gruppe, damit Gruppen-Nachrichten zusätzlich zu den obigen Handlern verarbeitet werden
+    app.add_handler(MessageHandler(filters.ChatType.GROUPS & (filters.TEXT | filters.CAPTION) & ~filters.COMMAND, group_message), group=1)
+    return app
+
+def profile_startup() -> None:
+    """Prints the startup profile (python translator_bot.py --profile-startup) instead of polling."""
+    with startup_profile.phase("build application"):
+        build_application()
+    startup_profile.mark_ready()
+    with startup_profile.phase("gemini model (deferred until first use)"):
+        try:
+            get_model()
+        except TranslationError as e:
+            logger.warning(f"Model initialization failed: {e}")
+    startup_profile.uninstall()
+
+    report, within_target = startup_profile.report(STARTUP_TARGET_SECONDS)
+    print(report)
+    sys.exit(0 if within_target else 1)
+
+def main() -> None:
+    if '--profile-startup' in sys.argv:
+        profile_startup()
+        return
 
-    # Use the application's run_polling method
+    app = build_application()
+    # Use the application's run_polling method; stops gracefully on SIGINT/SIGTERM
     app.run_polling()
 
 if __name__ == '__main__':
@@ -1,8 +1,8 @@
+from collections import deque
 from datetime import datetime
-from utils import load_json, save_json
+from utils import save_json
 from constants import USAGE_STATS_FILE
-
-usage_stats = load_json(USAGE_STATS_FILE, {"total_translations": 0, "daily_stats": {}})
+from state import usage_stats
 
 def update_usage_stats() -> None:
     """
@@ -11,4 +11,38 @@ def update_usage_stats() -> None:
     today = datetime.now().strftime("%Y-%m-%d")
     usage_stats["total_translations"] += 1
     usage_stats["daily_stats"][today] = usage_stats["daily_stats"].get(today, 0) + 1
-    save_json(USAGE_STATS_FILE, usage_stats)
\ No newline at end of file
+    save_json(USAGE_STATS_FILE, usage_stats)
+
+# Antwortzeiten weitergeleiteter Nachrichten (Sekunden), getrennt nach Cache-Treffer und -Fehlschlag
+_forward_latencies = {"cache_hit": deque(maxlen=1000), "cache_miss": deque(maxlen=1000)}
+
+def record_forward_latency(seconds: float, cache_hit: bool) -> None:
+    """
+    Records the time from receiving a forwarded message to sending its translation.
+
+    Args:
+        seconds: The latency in seconds.
+        cache_hit: Whether the translation was already cached.
+    """
+    _forward_latencies["cache_hit" if cache_hit else "cache_miss"].append(seconds)
+
+def _p95(samples) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+def forward_latency_report() -> str:
+    """
+    Formats the p95 forward latency over the last 1000 forwards per category.
+
+    Returns:
+        A human-readable report.
+    """
+    all_samples = list(_forward_latencies["cache_hit"]) + list(_forward_latencies["cache_miss"])
+    lines = ["⏱️ Forward latency (p95):"]
+    for label, samples in (("all", all_samples), ("cache hit", _forward_latencies["cache_hit"]),
+                           ("cache miss", _forward_latencies["cache_miss"])):
+        p95 = _p95(samples)
+        lines.append(f"{label}: {p95:.2f}s ({len(samples)} samples)" if p95 is not None else f"{label}: no data")
+    return "\n".join(lines)
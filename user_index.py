@@ -0,0 +1,207 @@
+import sys
+from array import array
+from collections import Counter
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()  # constants liest ADMIN_USER_IDS beim Import
+
+from constants import VALID_LANGUAGE_CODES
+
+_UNSET_LANGUAGE = 255  # Nutzer ohne gespeicherte Sprache (z.B. nur als VIP oder durch Aktivität bekannt)
+
+class UserIndex:
+    """
+    Compact in-memory index for the per-message user lookups.
+
+    Users are addressed by their integer ID and stored as rows in array-backed columns: the preferred
+    language as a small int, a VIP bit, the last activity timestamp and the number of translations
+    not yet written to cold storage. Full profiles stay in user_info.json (see user_management).
+    """
+
+    def __init__(self):
+        self._rows = {}  # type: dict[int, int]  # user_id -> row
+        self._user_ids = array('q')
+        self._languages = array('B')  # Index in self._codes oder _UNSET_LANGUAGE
+        self._last_activity = array('d')  # Unix-Zeit, 0 = unbekannt
+        self._pending_counts = array('I')  # Übersetzungen seit dem letzten Flush
+        self._profile_hashes = array('q')  # Hash von Name/Username, um Profiländerungen zu erkennen
+        self._vip_bits = bytearray()
+        self._dirty_rows = set()
+        self._codes = list(VALID_LANGUAGE_CODES)
+        self._code_ids = {code: i for i, code in enumerate(self._codes)}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._rows
+
+    def _language_id(self, language: str) -> int:
+        language_id = self._code_ids.get(language)
+        if language_id is None:
+            if len(self._codes) >= _UNSET_LANGUAGE:
+                raise ValueError(f"Too many distinct language codes, cannot add {language}")
+            language_id = len(self._codes)
+            self._codes.append(language)
+            self._code_ids[language] = language_id
+        return language_id
+
+    def ensure(self, user_id: int, language: str | None) -> bool:
+        """
+        Adds a user with the given language unless the user already exists. An existing user
+        without a language gets the given one.
+
+        Args:
+            user_id: The ID of the user.
+            language: The language code, or None to leave the language unset.
+
+        Returns:
+            True if the user was added or got their first language.
+        """
+        row = self._rows.get(user_id)
+        if row is not None:
+            if language is None or self._languages[row] != _UNSET_LANGUAGE:
+                return False
+            self._languages[row] = self._language_id(language)
+            return True
+        row = len(self._user_ids)
+        self._rows[user_id] = row
+        self._user_ids.append(user_id)
+        self._languages.append(_UNSET_LANGUAGE if language is None else self._language_id(language))
+        self._last_activity.append(0.0)
+        self._pending_counts.append(0)
+        self._profile_hashes.append(0)
+        if row % 8 == 0:
+            self._vip_bits.append(0)
+        return True
+
+    def get_language(self, user_id: int) -> str | None:
+        row = self._rows.get(user_id)
+        if row is None or self._languages[row] == _UNSET_LANGUAGE:
+            return None
+        return self._codes[self._languages[row]]
+
+    def set_language(self, user_id: int, language: str) -> None:
+        if not self.ensure(user_id, language):
+            self._languages[self._rows[user_id]] = self._language_id(language)
+
+    def is_vip(self, user_id: int) -> bool:
+        row = self._rows.get(user_id)
+        return row is not None and bool(self._vip_bits[row >> 3] & (1 << (row & 7)))
+
+    def set_vip(self, user_id: int, vip: bool) -> None:
+        self.ensure(user_id, None)
+        row = self._rows[user_id]
+        if vip:
+            self._vip_bits[row >> 3] |= 1 << (row & 7)
+        else:
+            self._vip_bits[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def touch(self, user_id: int, timestamp: float, profile_hash: int) -> bool:
+        """
+        Records activity of a user: updates the last activity and counts one translation.
+
+        Returns:
+            True if the profile hash changed, i.e. the cold profile needs an update.
+        """
+        self.ensure(user_id, None)
+        row = self._rows[user_id]
+        self._last_activity[row] = timestamp
+        self._pending_counts[row] += 1
+        self._dirty_rows.add(row)
+        if self._profile_hashes[row] != profile_hash:
+            self._profile_hashes[row] = profile_hash
+            return True
+        return False
+
+    def has_dirty(self) -> bool:
+        """Returns True if any user has activity not yet popped with pop_dirty()."""
+        return bool(self._dirty_rows)
+
+    def pop_dirty(self):
+        """
+        Yields (user_id, last_activity, pending translation count) for every user with unsaved
+        activity and resets the pending counts.
+        """
+        rows, self._dirty_rows = self._dirty_rows, set()
+        for row in rows:
+            count = self._pending_counts[row]
+            self._pending_counts[row] = 0
+            yield self._user_ids[row], self._last_activity[row], count
+
+    def language_counts(self) -> Counter:
+        """Returns the number of users per language code. Users without a language are not counted."""
+        counts = Counter(self._languages)
+        counts.pop(_UNSET_LANGUAGE, None)
+        return Counter({self._codes[language_id]: count for language_id, count in counts.items()})
+
+    def nbytes(self) -> int:
+        """Approximate memory footprint in bytes, including the ID-to-row mapping."""
+        columns = (self._user_ids, self._languages, self._last_activity, self._pending_counts,
+                   self._profile_hashes, self._vip_bits)
+        # Ints >= 2**30 belegen je 32 Bytes (Schlüssel), Zeilennummern >= 257 je 28 Bytes (Werte)
+        # Kopien: kann aus einem Thread (Speicher-Snapshot) aufgerufen werden, während der Event-Loop schreibt
+        int_objects = sum(sys.getsizeof(user_id) for user_id in list(self._rows)) + sum(
+            sys.getsizeof(row) for row in list(self._rows.values()) if row > 256)
+        return sys.getsizeof(self._rows) + int_objects + sum(sys.getsizeof(column) for column in columns)
+
+def _run_benchmark(user_count: int) -> str:
+    """Compares memory and lookup speed of the string-keyed dicts with the UserIndex."""
+    import random
+    import time
+    import tracemalloc
+
+    codes = list(VALID_LANGUAGE_CODES)
+    user_ids = [5_000_000_000 + i * 7 for i in range(user_count)]  # Realistische Telegram-IDs (> 2**32)
+    lookups = random.Random(1).choices(user_ids, k=200_000)
+
+    tracemalloc.start()
+    settings = {str(user_id): codes[i % len(codes)] for i, user_id in enumerate(user_ids)}
+    info = {str(user_id): {"username": None, "first_name": "User", "last_name": None, "language_code": "en",
+                           "last_activity": "2024-01-01 12:00:00", "translation_count": 3}
+            for user_id in user_ids}
+    vips = {str(user_id) for user_id in user_ids[::100]}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for user_id in lookups:
+        key = str(user_id)
+        if key not in settings:
+            settings[key] = 'en'
+        settings.get(key, 'en')
+        key in vips
+        info[key]["last_activity"] = "2024-01-02 12:00:00"
+        info[key]["translation_count"] += 1
+    dict_ns = (time.perf_counter() - start) / len(lookups) * 1e9
+    del settings, info, vips
+
+    tracemalloc.start()
+    index = UserIndex()
+    for i, user_id in enumerate(user_ids):
+        index.ensure(user_id, codes[i % len(codes)])
+    for user_id in user_ids[::100]:
+        index.set_vip(user_id, True)
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    now = time.time()
+    start = time.perf_counter()
+    for user_id in lookups:
+        index.ensure(user_id, 'en')
+        index.get_language(user_id)
+        index.is_vip(user_id)
+        index.touch(user_id, now, 12345)
+    index_ns = (time.perf_counter() - start) / len(lookups) * 1e9
+
+    return (f"{user_count:>9,} users | dicts: {dict_bytes / 1024 / 1024:8.1f} MiB, {dict_bytes / user_count:6.0f} B/user, "
+            f"{dict_ns:5.0f} ns/message | index: {index_bytes / 1024 / 1024:7.1f} MiB, "
+            f"{index_bytes / user_count:5.0f} B/user, {index_ns:5.0f} ns/message")
+
+if __name__ == '__main__':
+    # python user_index.py [anzahl ...]  -> Speicher- und Lookup-Benchmark (Standard: 100k und 1M Nutzer)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        print(_run_benchmark(size))
@@ -1,13 +1,48 @@
-from typing import Dict, Any
+import logging
+import time
+from collections import deque
 from telegram import User
 
-from utils import load_json, save_json
-from constants import USER_SETTINGS_FILE, VIP_USERS_FILE, USER_INFO_FILE # Added USER_INFO_FILE
+from utils import save_json
+from constants import USER_SETTINGS_FILE, USER_INFO_FILE, VIP_USERS_FILE
+from state import user_settings, vip_users, get_user_info
+from user_index import UserIndex
 from datetime import datetime
 
-user_settings = load_json(USER_SETTINGS_FILE)
-vip_users = set(load_json(VIP_USERS_FILE, []))
-user_info = load_json(USER_INFO_FILE)
+logger = logging.getLogger(__name__)
+
+_top_languages = []  # Zwischengespeicherte Sprachverteilung, siehe get_top_languages()
+_top_languages_time = 0.0
+TOP_LANGUAGES_TTL = 300  # Sekunden
+HISTORY_LENGTH = 10  # Gespeicherte Übersetzungen pro Nutzer
+
+def _build_index(settings: dict, vips: set) -> UserIndex:
+    index = UserIndex()
+    for user_id, language in settings.items():
+        if user_id.isdigit():
+            index.ensure(int(user_id), language)
+        else:
+            logger.warning(f"Ignoring non-numeric user ID in user settings: {user_id!r}")
+    for user_id in vips:
+        # Ältere Versionen haben beliebigen Admin-Text gespeichert (z.B. '@name'); der passt nie auf eine ID
+        if user_id.isdigit():
+            index.set_vip(int(user_id), True)
+        else:
+            logger.warning(f"Ignoring non-numeric VIP user ID: {user_id!r}")
+    return index
+
+# Heißer Pfad: Jede Nachricht liest Sprache und VIP-Status und zählt die Aktivität im kompakten Index.
+# user_settings.json und vip_users.json bleiben die gespeicherte Form; user_info.json (volle Profile)
+# wird nur noch gesammelt per flush_user_activity() geschrieben.
+_index = _build_index(user_settings, vip_users)
+
+_pending_profiles = {}  # user_id -> geänderte Profildaten, die noch nicht in user_info stehen
+_pending_history = {}  # user_id -> deque der neuen Übersetzungen, die noch nicht in user_info stehen
+_user_info_dirty = False
+
+def _profile_of(user: User) -> dict:
+    return {"username": user.username, "first_name": user.first_name,
+            "last_name": user.last_name, "language_code": user.language_code}
 
 def ensure_user_in_settings(user_id: int) -> None:
     """
@@ -16,22 +51,23 @@ def ensure_user_in_settings(user_id: int) -> None:
     Args:
         user_id: The ID of the user.
     """
-    user_id_str = str(user_id)
-    if user_id_str not in user_settings:
-        user_settings[user_id_str] = 'en'
+    if _index.ensure(user_id, 'en'):
+        user_settings[str(user_id)] = 'en'
         save_json(USER_SETTINGS_FILE, user_settings)
 
-def get_user_language(user_id: int) -> str:
+def get_user_language(user_id: int, default: str | None = 'en') -> str | None:
     """
     Gets the preferred language of a user.
 
     Args:
         user_id: The ID of the user.
+        default: The value returned for unknown users.
 
     Returns:
         The language code of the user's preferred language.
     """
-    return user_settings.get(str(user_id), 'en')
+    language = _index.get_language(user_id)
+    return default if language is None else language
 
 def set_user_language(user_id: int, language: str) -> None:
     """
@@ -41,39 +77,101 @@ def set_user_language(user_id: int, language: str) -> None:
         user_id: The ID of the user.
         language: The language code to set.
     """
+    _index.set_language(int(user_id), language)
     user_settings[str(user_id)] = language
     save_json(USER_SETTINGS_FILE, user_settings)
 
+def reset_user_languages() -> None:
+    """
+    Removes the language settings of all users. VIP status and pending activity are kept.
+    """
+    global _index, _top_languages
+    flush_user_activity()
+    user_settings.clear()
+    save_json(USER_SETTINGS_FILE, user_settings)
+    _index = _build_index(user_settings, vip_users)
+    _top_languages = []
+
 def update_user_info(user: User) -> None:
     """
-    Updates the user information in the user info file.
+    Records a translation for a user.
+
+    Only the compact index is updated here; the full profile is written to the user info file
+    by the next flush_user_activity().
 
     Args:
         user: The Telegram User object.
     """
-    user_id = str(user.id)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    if user_id not in user_info:
-        user_info[user_id] = {
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "language_code": user.language_code,
-            "last_activity": now,
-            "translation_count": 0
-        }
-    else:
-       user_info[user_id]["username"] = user.username
-       user_info[user_id]["first_name"] = user.first_name
-       user_info[user_id]["last_name"] = user.last_name
-       user_info[user_id]["language_code"] = user.language_code
-       user_info[user_id]["last_activity"] = now
-       if "translation_count" not in user_info[user_id]:
-            user_info[user_id]["translation_count"] = 0
+    profile_hash = hash((user.username, user.first_name, user.last_name, user.language_code))
+    if _index.touch(user.id, time.time(), profile_hash):
+        _pending_profiles[user.id] = _profile_of(user)
+
+def _apply_pending_activity() -> None:
+    """Merges the activity collected in the index into the (lazily loaded) full profiles."""
+    global _user_info_dirty
+    if not _index.has_dirty() and not _pending_history:
+        return  # Nichts zu tun: user_info nicht unnötig von der Platte laden
+    user_info = get_user_info()
+    for user_id, last_activity, count in _index.pop_dirty():
+        user_id_str = str(user_id)
+        profile = _pending_profiles.pop(user_id, None)
+        if user_id_str not in user_info:
+            user_info[user_id_str] = {"username": None, "first_name": None, "last_name": None,
+                                      "language_code": None, "translation_count": 0}
+        entry = user_info[user_id_str]
+        if profile is not None:
+            entry.update(profile)
+        entry["last_activity"] = datetime.fromtimestamp(last_activity).strftime("%Y-%m-%d %H:%M:%S")
+        entry["translation_count"] = entry.get("translation_count", 0) + count
+        _user_info_dirty = True
+    for user_id, entries in _pending_history.items():
+        profile = user_info.get(str(user_id))
+        if profile is not None:
+            history = profile.setdefault("translation_history", [])
+            history.extend(entries)
+            del history[:-HISTORY_LENGTH]
+            _user_info_dirty = True
+    _pending_history.clear()
+
+def flush_user_activity() -> None:
+    """
+    Writes the collected user activity to the user info file. Called periodically and at shutdown.
+    """
+    global _user_info_dirty
+    _apply_pending_activity()
+    if _user_info_dirty:
+        save_json(USER_INFO_FILE, get_user_info())
+        _user_info_dirty = False
+
+def get_user_profile(user_id: int) -> dict | None:
+    """
+    Gets the full profile of a user, including activity not yet flushed.
+
+    Args:
+        user_id: The ID of the user.
+
+    Returns:
+        The profile dict, or None if the user is unknown.
+    """
+    _apply_pending_activity()
+    return get_user_info().get(str(user_id))
+
+def add_translation_history(user_id: int, original_text: str, translated_text: str) -> None:
+    """
+    Appends a translation to the user's history (the last HISTORY_LENGTH are kept).
 
-    user_info[user_id]["translation_count"] += 1
-    save_json(USER_INFO_FILE, user_info)
+    The entry is buffered and merged into the full profile by the next flush_user_activity()
+    or get_user_profile(), so the hot path never loads the user info file.
+
+    Args:
+        user_id: The ID of the user.
+        original_text: The original text.
+        translated_text: The translation.
+    """
+    entries = _pending_history.get(user_id)
+    if entries is None:
+        entries = _pending_history[user_id] = deque(maxlen=HISTORY_LENGTH)
+    entries.append({"original_text": original_text, "translated_text": translated_text})
 
 def is_vip(user_id: int) -> bool:
     """
@@ -85,4 +183,39 @@ def is_vip(user_id: int) -> bool:
     Returns:
         True if the user is a VIP user, False otherwise.
     """
-    return str(user_id) in vip_users
\ No newline at end of file
+    return _index.is_vip(user_id)
+
+def set_vip(user_id: int, vip: bool) -> None:
+    """
+    Adds a user to or removes a user from the VIP users.
+
+    Args:
+        user_id: The ID of the user. Non-numeric entries saved by older versions can only be removed.
+        vip: True to add the user, False to remove them.
+    """
+    if str(user_id).isdigit():
+        _index.set_vip(int(user_id), vip)
+    if vip:
+        vip_users.add(str(user_id))
+    else:
+        vip_users.discard(str(user_id))
+    save_json(VIP_USERS_FILE, list(vip_users))
+
+def get_top_languages(limit: int) -> list[str]:
+    """
+    Gets the most common preferred languages across all users.
+
+    The distribution is recomputed at most every TOP_LANGUAGES_TTL seconds.
+
+    Args:
+        limit: The maximum number of languages to return.
+
+    Returns:
+        The language codes, most common first.
+    """
+    global _top_languages, _top_languages_time
+    now = time.monotonic()
+    if not _top_languages or now - _top_languages_time > TOP_LANGUAGES_TTL:
+        _top_languages = [language for language, _ in _index.language_counts().most_common()]
+        _top_languages_time = now
+    return _top_languages[:limit]
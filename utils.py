@@ -39,4 +39,26 @@ def save_json(filename: str, data: Any) -> None:
     except TypeError as e:
         print(f"Error saving JSON to file {filename}: {e}. Data type not serializable.")
     except Exception as e:
-        print(f"Error saving JSON to file {filename}: {e}")
\ No newline at end of file
+        print(f"Error saving JSON to file {filename}: {e}")
+
+def split_message(text: str, limit: int = 4096) -> list[str]:
+    """
+    Splits a text into parts that fit into a single Telegram message.
+
+    Args:
+        text: The text to split.
+        limit: The maximum length of a part (Telegram allows 4096 characters).
+
+    Returns:
+        A list of message parts, split at line breaks where possible.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        parts.append(text)
+    return parts
@@ -0,0 +1,236 @@
+import asyncio
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from telegram import Bot
+
+from translation_service import translate_text
+from constants import (
+    VOICE_MAX_FILE_SIZE, VOICE_MAX_DURATION, VOICE_MAX_CONCURRENT_JOBS, VOICE_MAX_CONCURRENT_CHUNKS,
+    VOICE_PROCESS_WORKERS, VOICE_SAMPLE_RATE, VOICE_MAX_CHUNK_MS, VOICE_RECOGNIZER, VOICE_DEFAULT_LANGUAGE
+)
+
+logger = logging.getLogger(__name__)
+
+class VoiceTranslationError(Exception):
+    """Custom exception for voice-translation-related errors."""
+    pass
+
+# --- Recognizer Backends ---
+
+class SpeechRecognizer:
+    """Base class for speech-to-text backends. Subclasses implement transcribe()."""
+    name = "base"
+
+    def transcribe(self, wav_data: bytes, language: str) -> str:
+        """
+        Transcribes a single mono WAV chunk.
+
+        Args:
+            wav_data: The WAV-encoded audio chunk.
+            language: The spoken language (e.g., 'en-US', 'de').
+
+        Returns:
+            The recognized text, or an empty string if nothing was recognized.
+        """
+        raise NotImplementedError
+
+class GoogleSpeechRecognizer(SpeechRecognizer):
+    """Uses the free Google Web Speech API through the SpeechRecognition library."""
+    name = "google"
+
+    def transcribe(self, wav_data: bytes, language: str) -> str:
+        import speech_recognition as sr  # Schwerer Import, nur bei Bedarf laden
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(io.BytesIO(wav_data)) as source:
+            audio = recognizer.record(source)
+        try:
+            return recognizer.recognize_google(audio, language=language)
+        except sr.UnknownValueError:
+            return ""  # Stille oder unverständlich
+        except sr.RequestError as e:
+            raise VoiceTranslationError(f"Speech recognition request failed: {e}")
+
+class OfflineStubRecognizer(SpeechRecognizer):
+    """Offline recognizer for tests; returns a fixed transcript for every chunk."""
+    name = "stub"
+
+    def __init__(self, transcript: str = "voice message"):
+        self.transcript = transcript
+
+    def transcribe(self, wav_data: bytes, language: str) -> str:
+        return self.transcript
+
+_recognizer_factories = {
+    GoogleSpeechRecognizer.name: GoogleSpeechRecognizer,
+    OfflineStubRecognizer.name: OfflineStubRecognizer,
+}
+_recognizer = None  # Active recognizer instance, private
+
+def register_recognizer(name: str, factory) -> None:
+    """
+    Registers an additional recognizer backend.
+
+    Args:
+        name: The name used in the VOICE_RECOGNIZER setting.
+        factory: A callable returning a SpeechRecognizer instance.
+    """
+    _recognizer_factories[name] = factory
+
+def set_recognizer(recognizer: SpeechRecognizer) -> None:
+    """Replaces the active recognizer (e.g., with an OfflineStubRecognizer in tests)."""
+    global _recognizer
+    _recognizer = recognizer
+
+def get_recognizer() -> SpeechRecognizer:
+    """Singleton pattern to get the configured recognizer backend."""
+    global _recognizer
+    if _recognizer is None:
+        factory = _recognizer_factories.get(VOICE_RECOGNIZER)
+        if factory is None:
+            raise VoiceTranslationError(f"Unknown speech recognizer: {VOICE_RECOGNIZER}")
+        _recognizer = factory()
+    return _recognizer
+
+# --- Audio Decoding (runs in worker processes) ---
+
+_process_pool = None  # Created on first use, private
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=VOICE_PROCESS_WORKERS)
+    return _process_pool
+
+def shutdown_voice_pool() -> None:
+    """Shuts down the audio decoding process pool, if it was started."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def _decode_and_split(path: str, sample_rate: int, max_duration_ms: int, max_chunk_ms: int) -> list[bytes]:
+    """
+    Decodes an OGG/Opus file, resamples it to mono PCM and splits it on silence.
+
+    Runs inside the process pool, so it must stay a module-level function.
+
+    Returns:
+        A list of WAV-encoded chunks, each at most max_chunk_ms long.
+    """
+    from pydub import AudioSegment
+    from pydub.silence import split_on_silence
+
+    audio = AudioSegment.from_file(path, format="ogg")
+    if len(audio) > max_duration_ms:
+        raise ValueError(f"Audio is longer than {max_duration_ms // 1000} seconds")
+    if audio.dBFS == float("-inf"):
+        return []  # Nur Stille
+
+    audio = audio.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+    segments = split_on_silence(audio, min_silence_len=500, silence_thresh=audio.dBFS - 16,
+                                keep_silence=250, seek_step=10) or [audio]
+
+    wav_chunks = []
+    for segment in segments:
+        for start in range(0, len(segment), max_chunk_ms):
+            buffer = io.BytesIO()
+            segment[start:start + max_chunk_ms].export(buffer, format="wav")
+            wav_chunks.append(buffer.getvalue())
+    return wav_chunks
+
+# --- Pipeline ---
+
+# Begrenzen, wie viele Voice-Nachrichten und Erkennungsaufrufe gleichzeitig laufen
+_job_semaphore = asyncio.Semaphore(VOICE_MAX_CONCURRENT_JOBS)
+_chunk_semaphore = asyncio.Semaphore(VOICE_MAX_CONCURRENT_CHUNKS)
+
+async def transcribe_voice(bot: Bot, file_id: str, language: str = None,
+                           file_size: int = None, duration: int = None) -> str:
+    """
+    Downloads a voice message and transcribes it.
+
+    The file is streamed to a temporary file, decoded in the process pool and the
+    silence-separated chunks are transcribed concurrently.
+
+    Args:
+        bot: The bot used to download the file.
+        file_id: The Telegram file ID of the voice message.
+        language: The spoken language (optional). Falls back to VOICE_DEFAULT_LANGUAGE.
+        file_size: The file size reported by Telegram (optional), checked before downloading.
+        duration: The duration in seconds reported by Telegram (optional), checked before downloading.
+
+    Returns:
+        The transcript, or an empty string if no speech was recognized.
+
+    Raises:
+        VoiceTranslationError: If the voice message is too large or cannot be processed.
+    """
+    if file_size and file_size > VOICE_MAX_FILE_SIZE:
+        raise VoiceTranslationError("Voice message is too large.")
+    if duration and duration > VOICE_MAX_DURATION:
+        raise VoiceTranslationError(f"Voice messages longer than {VOICE_MAX_DURATION // 60} minutes are not supported.")
+
+    async with _job_semaphore:
+        fd, path = tempfile.mkstemp(suffix=".ogg")
+        os.close(fd)
+        try:
+            tg_file = await bot.get_file(file_id)
+            if tg_file.file_size and tg_file.file_size > VOICE_MAX_FILE_SIZE:
+                raise VoiceTranslationError("Voice message is too large.")
+            await tg_file.download_to_drive(path)
+
+            loop = asyncio.get_running_loop()
+            chunks = await loop.run_in_executor(
+                _get_process_pool(), _decode_and_split,
+                path, VOICE_SAMPLE_RATE, VOICE_MAX_DURATION * 1000, VOICE_MAX_CHUNK_MS
+            )
+        except VoiceTranslationError:
+            raise
+        except Exception as e:
+            logger.exception(f"Failed to decode voice message {file_id}: {e}")
+            raise VoiceTranslationError(f"Could not process the voice message: {e}")
+        finally:
+            os.remove(path)
+
+        recognizer = get_recognizer()
+        speech_language = language or VOICE_DEFAULT_LANGUAGE
+
+        async def _transcribe(chunk: bytes) -> str:
+            async with _chunk_semaphore:
+                return await asyncio.to_thread(recognizer.transcribe, chunk, speech_language)
+
+        parts = await asyncio.gather(*(_transcribe(chunk) for chunk in chunks))
+
+    return " ".join(part.strip() for part in parts if part.strip())
+
+async def translate_voice(bot: Bot, file_id: str, target_language: str, source_language: str = None,
+                          file_size: int = None, duration: int = None) -> tuple[str, str]:
+    """
+    Transcribes a voice message and translates the transcript.
+
+    Args:
+        bot: The bot used to download the file.
+        file_id: The Telegram file ID of the voice message.
+        target_language: The target language code (e.g., 'en', 'de').
+        source_language: The source language code (optional).
+        file_size: The file size reported by Telegram (optional).
+        duration: The duration in seconds reported by Telegram (optional).
+
+    Returns:
+        A tuple of (transcript, translated text).
+
+    Raises:
+        VoiceTranslationError: If no speech was recognized or the audio cannot be processed.
+        TranslationError: If the translation fails.
+    """
+    transcript = await transcribe_voice(bot, file_id, source_language, file_size, duration)
+    if not transcript:
+        raise VoiceTranslationError("No speech could be recognized in the voice message.")
+
+    translated_text = await asyncio.to_thread(translate_text, transcript, target_language, source_language)
+    return transcript, translated_text